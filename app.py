@@ -2,12 +2,16 @@ import streamlit as st
 import os
 import time
 import random
+import uuid
 
 # Import components
 from src.components.url_input import url_input_section
 from src.components.queue_manager import queue_manager_section
+from src.components.job_progress import job_progress_section
 from src.components.results_display import results_section
-from src.config.constants import PAGE_CONFIG
+from src.config.constants import PAGE_CONFIG, METRICS_HOST, METRICS_PORT
+from src.utils.jobs import get_job_runner
+from src.utils.telemetry import start_metrics_server
 
 # Load CSS
 def load_css():
@@ -26,6 +30,16 @@ def init_app():
         st.session_state.screenshots_data = {}
     if 'show_results' not in st.session_state:
         st.session_state.show_results = False
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if 'current_job' not in st.session_state:
+        # Recover a running or finished job after a page refresh
+        st.session_state.current_job = st.experimental_get_query_params().get("job", [None])[0]
+    
+    # Start the shared job runner and warm up the browser pool before the first capture
+    get_job_runner()
+    # Prometheus metrics of this process on METRICS_PORT (only the first run starts it)
+    start_metrics_server(METRICS_HOST, METRICS_PORT)
 
 def main():
     try:
@@ -41,6 +55,9 @@ def main():
         # Queue Manager Section
         queue_manager_section()
         
+        # Background Job Progress Section
+        job_progress_section()
+        
         # Results Section
         results_section()
         
@@ -0,0 +1,307 @@
+"""Asynchronous HTTP API for capture jobs.
+
+Runs next to the Streamlit UI and shares its job store, blob store and
+browser pool settings, so jobs are captured by the same warm browsers
+instead of one browser per request. Results are returned by reference:
+job responses link to the images and the archive, which are streamed
+from disk.
+
+    python -m src.api --port 8502
+
+    POST /jobs                       {"urls": [...], "resolutions": [...], "options": {...}}
+    GET  /jobs/{id}                  status and counters, including captures served from cache
+    GET  /jobs/{id}/results          finished tasks (?since=<finished_at> for incremental polling)
+    GET  /jobs/{id}/images/{seq}     full-size image
+    GET  /jobs/{id}/thumbnails/{seq} preview image
+    GET  /jobs/{id}/archive          ZIP with every capture, once the job is finished
+    GET  /healthz                    queue usage and capture cache hit/miss statistics
+    GET  /metrics                    Prometheus metrics of this process
+
+This module must not import Streamlit.
+"""
+import argparse
+import asyncio
+import logging
+import uuid
+
+from aiohttp import web
+
+from .config.constants import (
+    API_HOST, API_PORT, API_NAMESPACE, API_RETRY_AFTER, READINESS_POLICIES, CACHE_MODES,
+    REQUEST_BLOCKING_PROFILES, JOB_PRIORITIES, OUTPUT_FORMATS,
+)
+from .utils.jobs import ACTIVE_JOB_STATUSES, JobQueueFull, JobRunner, get_job_runner
+from .utils.screenshot import CaptureOptions
+from .utils.telemetry import render_metrics
+from .utils.validation import parse_resolution, validate_url
+
+logger = logging.getLogger("bender.api")
+
+RUNNER = web.AppKey("runner", JobRunner)
+DEFAULT_RESOLUTIONS = ["Desktop (1920x1080)"]
+MAX_URLS_PER_JOB = 10000
+
+
+def _error(status, message, headers=None):
+    return web.json_response({"error": message}, status=status, headers=headers)
+
+
+def parse_job_request(body):
+    """Validate a POST /jobs body and return (urls, resolutions, options).
+
+    Raises ValueError with a message suitable for the client.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    urls = body.get("urls")
+    if not isinstance(urls, list) or not urls:
+        raise ValueError("urls must be a non-empty list")
+    if len(urls) > MAX_URLS_PER_JOB:
+        raise ValueError(f"At most {MAX_URLS_PER_JOB} URLs per job")
+    invalid = [url for url in urls if not isinstance(url, str) or not validate_url(url.strip())]
+    if invalid:
+        raise ValueError(f"Invalid URLs: {invalid[:5]}")
+
+    names = body.get("resolutions") or DEFAULT_RESOLUTIONS
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise ValueError("resolutions must be a list of names or WIDTHxHEIGHT strings")
+    resolutions = {}
+    for name in names:
+        name, width, height = parse_resolution(name)
+        resolutions[name] = (width, height)
+
+    options = body.get("options") or {}
+    if not isinstance(options, dict):
+        raise ValueError("options must be an object")
+    readiness = options.get("readiness", CaptureOptions.readiness)
+    if readiness not in READINESS_POLICIES:
+        raise ValueError(f"readiness must be one of {list(READINESS_POLICIES)}")
+    cache_mode = options.get("cache_mode", "use")
+    if cache_mode not in CACHE_MODES:
+        raise ValueError(f"cache_mode must be one of {list(CACHE_MODES)}")
+    blocking = options.get("blocking", CaptureOptions.blocking)
+    if blocking not in REQUEST_BLOCKING_PROFILES:
+        raise ValueError(f"blocking must be one of {list(REQUEST_BLOCKING_PROFILES)}")
+    priority = options.get("priority", CaptureOptions.priority)
+    if priority not in JOB_PRIORITIES:
+        raise ValueError(f"priority must be one of {list(JOB_PRIORITIES)}")
+    output_format = options.get("output_format", CaptureOptions.output_format)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {list(OUTPUT_FORMATS)}")
+    output_quality = options.get("output_quality", CaptureOptions.output_quality)
+    if not isinstance(output_quality, int) or not 1 <= output_quality <= 100:
+        raise ValueError("output_quality must be an integer between 1 and 100")
+    max_dimension = options.get("max_dimension", 0)
+    if not isinstance(max_dimension, int) or max_dimension < 0:
+        raise ValueError("max_dimension must be a non-negative integer")
+    capture_options = CaptureOptions(
+        readiness=readiness,
+        multi_viewport=bool(options.get("multi_viewport", True)),
+        cache_mode=cache_mode,
+        blocking=blocking,
+        priority=priority,
+        output_format=output_format,
+        output_quality=output_quality,
+        max_dimension=max_dimension,
+        png_optimize=bool(options.get("png_optimize", False)),
+        incremental=bool(options.get("incremental", False)),
+    )
+    return [url.strip() for url in urls], resolutions, capture_options
+
+
+def _is_api_namespace(session_id):
+    # "api" a secas: jobs creados antes de usar un namespace por job
+    return session_id == API_NAMESPACE or (session_id or "").startswith(f"{API_NAMESPACE}-")
+
+
+async def _load_job(request):
+    """Fetch the job named in the URL, or raise 404 for unknown or non-API jobs"""
+    runner = request.app[RUNNER]
+    job = await asyncio.to_thread(runner.store.get_job, request.match_info["job_id"])
+    # Los jobs de la UI llevan el session_id de Streamlit: no se exponen aquí
+    if job is None or not _is_api_namespace(job["session_id"]):
+        raise web.HTTPNotFound(text='{"error": "Unknown job"}', content_type="application/json")
+    return job
+
+
+def _job_links(request, job_id):
+    base = f"/jobs/{job_id}"
+    return {
+        "self": str(request.url.with_path(base).with_query(None)),
+        "results": str(request.url.with_path(f"{base}/results").with_query(None)),
+        "archive": str(request.url.with_path(f"{base}/archive").with_query(None)),
+    }
+
+
+def _job_status(request, job):
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "total": job["total"],
+        "completed": job["completed"],
+        "failed": job["failed"],
+        "error": job["error"],
+        "options": job["options"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "links": _job_links(request, job["id"]),
+    }
+
+
+def _task_result(request, job_id, task):
+    result = {
+        "seq": task["seq"],
+        "url": task["url"],
+        "resolution": task["resolution_name"],
+        "width": task["width"],
+        "height": task["height"],
+        "status": task["status"],
+        "error": task["error"],
+        "duration": task["duration"],
+        "finished_at": task["finished_at"],
+        "metadata": task["metadata"] or {},
+        "image_url": None,
+        "thumbnail_url": None,
+    }
+    if task["path"]:
+        result["image_url"] = str(request.url.with_path(f"/jobs/{job_id}/images/{task['seq']}").with_query(None))
+    if task["thumbnail"]:
+        result["thumbnail_url"] = str(request.url.with_path(f"/jobs/{job_id}/thumbnails/{task['seq']}").with_query(None))
+    return result
+
+
+async def submit_job(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return _error(400, "Request body must be valid JSON")
+    try:
+        urls, resolutions, options = parse_job_request(body)
+    except ValueError as e:
+        return _error(400, str(e))
+
+    runner = request.app[RUNNER]
+    try:
+        # Un namespace por job: la cuota del BlobStore es por namespace, y uno
+        # compartido por todos los clientes se llenaría con unos cientos de capturas
+        namespace = f"{API_NAMESPACE}-{uuid.uuid4().hex}"
+        job_id = await asyncio.to_thread(runner.submit, urls, resolutions, options, namespace)
+    except JobQueueFull as e:
+        return _error(429, str(e), headers={"Retry-After": str(API_RETRY_AFTER)})
+
+    job = await asyncio.to_thread(runner.store.get_job, job_id)
+    links = _job_links(request, job_id)
+    return web.json_response(_job_status(request, job), status=202, headers={"Location": links["self"]})
+
+
+async def get_job(request):
+    job = await _load_job(request)
+    status = _job_status(request, job)
+    status["cache_hits"] = await asyncio.to_thread(request.app[RUNNER].store.count_cache_hits, job["id"])
+    return web.json_response(status)
+
+
+async def get_results(request):
+    job = await _load_job(request)
+    store = request.app[RUNNER].store
+    try:
+        since = float(request.query.get("since", 0))
+    except ValueError:
+        return _error(400, "since must be a number")
+    tasks = await asyncio.to_thread(store.list_events, job["id"], since)
+    results = [_task_result(request, job["id"], task) for task in tasks]
+    return web.json_response({
+        "id": job["id"],
+        "status": job["status"],
+        "results": results,
+        # Pasar como ?since= en la siguiente consulta para recibir solo lo nuevo
+        "cursor": max((task["finished_at"] for task in tasks), default=since),
+    })
+
+
+async def _blob_response(request, column):
+    job = await _load_job(request)
+    runner = request.app[RUNNER]
+    try:
+        seq = int(request.match_info["seq"])
+    except ValueError:
+        raise web.HTTPNotFound()
+    task = await asyncio.to_thread(runner.store.get_task, job["id"], seq)
+    if task is None or not task[column]:
+        return _error(404, "No image for this task")
+    try:
+        ref = await asyncio.to_thread(runner.blobs.ref, task[column])
+    except (OSError, ValueError):
+        # La recolección de basura del BlobStore ya borró la imagen
+        return _error(404, "The image is no longer available")
+    # FileResponse envía el fichero por trozos (sendfile) sin cargarlo en memoria
+    return web.FileResponse(runner.blobs.path(ref), headers={"Content-Type": ref.media_type})
+
+
+async def get_image(request):
+    return await _blob_response(request, "path")
+
+
+async def get_thumbnail(request):
+    return await _blob_response(request, "thumbnail")
+
+
+async def get_archive(request):
+    job = await _load_job(request)
+    if job["status"] in ACTIVE_JOB_STATUSES:
+        return _error(409, "The archive is available once the job has finished",
+                      headers={"Retry-After": str(API_RETRY_AFTER)})
+    path = request.app[RUNNER].archive_path(job["id"])
+    if path is None:
+        return _error(404, "This job has no archive")
+    return web.FileResponse(path, headers={
+        "Content-Type": "application/zip",
+        "Content-Disposition": f'attachment; filename="screenshots_{job["id"]}.zip"',
+    })
+
+
+async def healthz(request):
+    runner = request.app[RUNNER]
+    active = await asyncio.to_thread(runner.store.count_active_jobs, runner.owner)
+    cache = await asyncio.to_thread(runner.engine.cache.stats)
+    return web.json_response({
+        "status": "ok", "active_jobs": active, "max_pending_jobs": runner.max_pending, "capture_cache": cache,
+    })
+
+
+async def get_metrics(request):
+    return web.Response(body=render_metrics().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def create_app(runner=None):
+    """Build the aiohttp application; runner defaults to the process-wide JobRunner"""
+    app = web.Application()
+    app[RUNNER] = runner or get_job_runner()
+    app.router.add_post("/jobs", submit_job)
+    app.router.add_get("/jobs/{job_id}", get_job)
+    app.router.add_get("/jobs/{job_id}/results", get_results)
+    app.router.add_get("/jobs/{job_id}/images/{seq}", get_image)
+    app.router.add_get("/jobs/{job_id}/thumbnails/{seq}", get_thumbnail)
+    app.router.add_get("/jobs/{job_id}/archive", get_archive)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", get_metrics)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.api", description="HTTP API for capture jobs.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    web.run_app(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Offline benchmark suite for the capture pipeline (python -m src.benchmarks)"""
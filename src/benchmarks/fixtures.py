@@ -0,0 +1,213 @@
+"""Synthetic fixture pages for the benchmark, served from a local HTTP server.
+
+Every page is generated from its path and query string, so a run needs
+no network access and produces the same pages every time.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_PAGE = """<!DOCTYPE html>
+<html lang="{lang}">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+  body {{ margin: 0; font-family: sans-serif; }}
+  .block {{ padding: 40px; border-bottom: 1px solid #ccc; }}
+  .grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(240px, 1fr)); gap: 16px; padding: 16px; }}
+  .grid img {{ width: 100%; height: 180px; object-fit: cover; background: #eee; }}
+  #cookie-banner {{ position: fixed; bottom: 0; left: 0; right: 0; padding: 24px; background: #222; color: #fff; z-index: 1000; }}
+  #cookie-banner button {{ margin-right: 12px; padding: 8px 16px; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+# Textos de los banners de cookies por idioma: (mensaje, aceptar, rechazar)
+COOKIE_BANNER_TEXTS = {
+    "en": ("We use cookies to improve your experience.", "Accept all", "Reject all"),
+    "es": ("Usamos cookies para mejorar tu experiencia.", "Aceptar todo", "Rechazar todo"),
+    "de": ("Wir verwenden Cookies, um Ihr Erlebnis zu verbessern.", "Alle akzeptieren", "Alle ablehnen"),
+    "fr": ("Nous utilisons des cookies pour améliorer votre expérience.", "Tout accepter", "Tout refuser"),
+    "it": ("Utilizziamo i cookie per migliorare la tua esperienza.", "Accetta tutto", "Rifiuta tutto"),
+}
+
+_COLORS = ("#e63946", "#f1a208", "#2a9d8f", "#264653", "#8338ec", "#3a86ff")
+
+
+def _blocks(count, height=300):
+    return "\n".join(
+        f'<div class="block" style="height:{height}px;background:{_COLORS[i % len(_COLORS)]}">'
+        f"<h2>Section {i + 1}</h2><p>{'Lorem ipsum dolor sit amet. ' * 20}</p></div>"
+        for i in range(count)
+    )
+
+
+def _svg(width, height, seed):
+    color = _COLORS[seed % len(_COLORS)]
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">'
+        f'<rect width="100%" height="100%" fill="{color}"/>'
+        f'<text x="50%" y="50%" font-size="32" fill="#fff" text-anchor="middle">{seed}</text></svg>'
+    ).encode("utf-8")
+
+
+def _tall_page(query):
+    height = int(query.get("height", 30000))
+    return "Tall page", "en", _blocks(max(1, height // 340))
+
+
+def _slow_assets_page(query):
+    delay = float(query.get("delay", 1.5))
+    images = "\n".join(
+        f'<img src="/asset/{i}.svg?delay={delay}" alt="">' for i in range(12)
+    )
+    return "Slow assets", "en", f'{_blocks(2)}<div class="grid">{images}</div>'
+
+
+def _lazy_page(query):
+    count = int(query.get("images", 40))
+    images = "\n".join(
+        f'<img loading="lazy" src="/asset/{i}.svg?delay=0.2" alt="">' for i in range(count)
+    )
+    return "Lazy images", "en", f'{_blocks(1)}<div class="grid">{images}</div>'
+
+
+def _cookie_banner(lang):
+    message, accept, reject = COOKIE_BANNER_TEXTS.get(lang, COOKIE_BANNER_TEXTS["en"])
+    return (
+        f'<div id="cookie-banner" role="dialog"><p>{message}</p>'
+        f'<button onclick="this.parentNode.remove()">{accept}</button>'
+        f'<button onclick="this.parentNode.remove()">{reject}</button></div>'
+    )
+
+
+def _cookies_page(query):
+    lang = query.get("lang", "en")
+    return "Cookie banner", lang, _blocks(6) + _cookie_banner(lang)
+
+
+def _cookies_iframe_page(query):
+    lang = query.get("lang", "en")
+    frame = (
+        f'<iframe src="/cookie-frame?lang={lang}" title="consent" '
+        f'style="position:fixed;bottom:0;left:0;width:100%;height:160px;border:0;z-index:1000"></iframe>'
+    )
+    return "Cookie banner in iframe", lang, _blocks(6) + frame
+
+
+def _cookie_frame(query):
+    lang = query.get("lang", "en")
+    return "Consent", lang, _cookie_banner(lang).replace(
+        "this.parentNode.remove()", "window.parent.document.querySelector('iframe').remove()"
+    )
+
+
+def _spa_page(query):
+    delay = int(float(query.get("delay", 0.8)) * 1000)
+    script = f"""
+<div id="root"><p>Loading…</p></div>
+<script>
+  setTimeout(function () {{
+    fetch("/api/items?delay=0.3").then(function (r) {{ return r.json(); }}).then(function (items) {{
+      var root = document.getElementById("root");
+      root.innerHTML = items.map(function (item, i) {{
+        return '<div class="block" style="height:260px;background:' + item.color + '"><h2>' + item.title + '</h2></div>';
+      }}).join("");
+    }});
+  }}, {delay});
+</script>"""
+    return "SPA hydration", "en", script
+
+
+PAGES = {
+    "/tall": _tall_page,
+    "/slow-assets": _slow_assets_page,
+    "/lazy": _lazy_page,
+    "/cookies": _cookies_page,
+    "/cookies-iframe": _cookies_iframe_page,
+    "/cookie-frame": _cookie_frame,
+    "/spa": _spa_page,
+}
+
+# Fixtures used by a benchmark run: name -> path with query string
+DEFAULT_FIXTURES = {
+    "tall": "/tall?height=30000",
+    "slow-assets": "/slow-assets?delay=1.5",
+    "lazy-images": "/lazy?images=40",
+    "cookies-en": "/cookies?lang=en",
+    "cookies-es": "/cookies?lang=es",
+    "cookies-de": "/cookies?lang=de",
+    "cookies-iframe-fr": "/cookies-iframe?lang=fr",
+    "spa": "/spa?delay=0.8",
+}
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        # En las páginas "delay" configura el fixture; en recursos y API retrasa la respuesta
+        if "delay" in query and parts.path.startswith(("/asset/", "/api/")):
+            time.sleep(float(query["delay"]))
+
+        if parts.path.startswith("/asset/"):
+            seed = int(parts.path.rsplit("/", 1)[-1].split(".")[0] or 0)
+            self._send(200, "image/svg+xml", _svg(480, 360, seed))
+        elif parts.path == "/api/items":
+            items = ",".join(
+                f'{{"title": "Item {i + 1}", "color": "{_COLORS[i % len(_COLORS)]}"}}' for i in range(12)
+            )
+            self._send(200, "application/json", f"[{items}]".encode("utf-8"))
+        elif parts.path in PAGES:
+            title, lang, body = PAGES[parts.path](query)
+            self._send(200, "text/html; charset=utf-8", _PAGE.format(title=title, lang=lang, body=body).encode("utf-8"))
+        else:
+            self._send(404, "text/plain", b"Not found")
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer:
+    """Serve the fixture pages on 127.0.0.1 from a background thread.
+
+        with FixtureServer() as server:
+            url = server.url("/tall?height=20000")
+    """
+
+    def __init__(self, port=0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _FixtureHandler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
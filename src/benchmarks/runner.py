@@ -0,0 +1,291 @@
+"""Run the capture pipeline against the fixture pages and report throughput and latency.
+
+    python -m src.benchmarks --workers 1 2 4 --repeat 3 --out bench.json
+    python -m src.benchmarks --baseline bench.json --out bench-new.json
+
+Every scenario (worker count x resolution set) gets its own browser pool,
+warmed up before the clock starts, and captures every fixture repeat
+times with the capture cache bypassed. Results are written as JSON;
+with --baseline, scenarios are compared by name and the exit code is 1
+when throughput or p95 latency regress by more than --tolerance.
+
+This module must not import Streamlit.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import psutil
+except ImportError:  # Sin psutil no se mide la memoria
+    psutil = None
+
+from ..config.constants import READINESS_POLICIES, DEFAULT_READINESS_POLICY
+from ..utils.browser_pool import BrowserPool
+from ..utils.capture_cache import CaptureCache
+from ..utils.capture_engine import CaptureEngine, CaptureTask
+from ..utils.consent import ConsentMemory
+from ..utils.scheduler import HostScheduler
+from ..utils.screenshot import CaptureOptions
+from ..utils.validation import parse_resolution
+from .fixtures import DEFAULT_FIXTURES, FixtureServer
+
+logger = logging.getLogger("bender.benchmarks")
+
+DEFAULT_RESOLUTION_SETS = [
+    "Desktop (1920x1080)",
+    "Mobile (375x667);Tablet (768x1024);Desktop (1920x1080)",
+]
+RSS_SAMPLE_INTERVAL = 0.25
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of values with linear interpolation; None if empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class RssSampler:
+    """Track the peak resident memory of this process plus every child (chromedriver, Chrome)"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def sample(self):
+        if psutil is None:
+            return None
+        root = psutil.Process()
+        total = 0
+        for process in [root] + root.children(recursive=True):
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+
+    def _run(self):
+        while not self._stop.is_set():
+            current = self.sample()
+            if current is not None:
+                self.peak_mb = max(self.peak_mb or 0.0, current)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _warm_pool(pool, workers):
+    """Start every browser of the pool before timing starts"""
+    browsers = [pool.acquire() for _ in range(workers)]
+    for browser in browsers:
+        pool.release(browser)
+
+
+def run_scenario(server, fixtures, workers, resolution_set, repeat, options):
+    """Capture every fixture repeat times and return the scenario's measurements"""
+    resolutions = [parse_resolution(name) for name in resolution_set.split(";") if name.strip()]
+    tasks = [
+        CaptureTask(f"{server.url(path)}{'&' if '?' in path else '?'}run={run}", name, width, height)
+        for run in range(repeat)
+        for path in fixtures.values()
+        for name, width, height in resolutions
+    ]
+    name = f"workers={workers} resolutions={len(resolutions)}"
+    logger.info("Running %s: %d captures", name, len(tasks))
+
+    pool = BrowserPool(min_size=workers, max_size=workers)
+    with tempfile.TemporaryDirectory(prefix="bender-bench-") as cache_dir:
+        # Todos los fixtures comparten 127.0.0.1: con el límite por host por defecto
+        # (MAX_TASKS_PER_HOST) nunca correrían más de 2 capturas a la vez
+        engine = CaptureEngine(
+            workers=workers, pool=pool, cache=CaptureCache(root=cache_dir),
+            scheduler=HostScheduler(per_host_limit=workers),
+            # Memoria de consentimiento propia: no depender de ejecuciones anteriores
+            consent_memory=ConsentMemory(path=None),
+        )
+        try:
+            warmup_start = time.perf_counter()
+            _warm_pool(pool, workers)
+            warmup = time.perf_counter() - warmup_start
+
+            latencies = []
+            failures = {}
+            produced = 0
+            with RssSampler() as sampler:
+                start = time.perf_counter()
+                for result in engine.map(tasks, options):
+                    latencies.append(result.duration)
+                    if result.ok:
+                        produced += len(result.screenshot)
+                    else:
+                        failure_class = result.metadata.get("failure", {}).get("class", "error")
+                        failures[failure_class] = failures.get(failure_class, 0) + 1
+                wall = time.perf_counter() - start
+        finally:
+            engine.shutdown()
+            pool.close()
+
+    pages = len(tasks) // len(resolutions)
+    return {
+        "name": name,
+        "workers": workers,
+        "resolutions": [r[0] for r in resolutions],
+        "pages": pages,
+        "captures": len(tasks),
+        "failed": sum(failures.values()),
+        "failures": failures,
+        "warmup_seconds": round(warmup, 3),
+        "wall_seconds": round(wall, 3),
+        "pages_per_min": round(pages / wall * 60, 2) if wall else None,
+        "captures_per_min": round(len(tasks) / wall * 60, 2) if wall else None,
+        "latency_seconds": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "mean": _round(sum(latencies) / len(latencies) if latencies else None),
+            "max": _round(max(latencies, default=None)),
+        },
+        "peak_rss_mb": _round(sampler.peak_mb, 1),
+        "bytes_produced": produced,
+    }
+
+
+def _round(value, digits=3):
+    return None if value is None else round(value, digits)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(report, baseline, tolerance):
+    """Compare scenarios by name; return a list of human-readable regressions"""
+    previous = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    regressions = []
+    for scenario in report["scenarios"]:
+        before = previous.get(scenario["name"])
+        if before is None:
+            continue
+        deltas = {}
+        if before.get("pages_per_min") and scenario.get("pages_per_min") is not None:
+            deltas["pages_per_min"] = scenario["pages_per_min"] / before["pages_per_min"] - 1
+            if deltas["pages_per_min"] < -tolerance:
+                regressions.append(
+                    f"{scenario['name']}: throughput {before['pages_per_min']} -> {scenario['pages_per_min']} pages/min"
+                )
+        p95_before, p95_now = before["latency_seconds"].get("p95"), scenario["latency_seconds"].get("p95")
+        if p95_before and p95_now is not None:
+            deltas["p95"] = p95_now / p95_before - 1
+            if deltas["p95"] > tolerance:
+                regressions.append(f"{scenario['name']}: p95 latency {p95_before}s -> {p95_now}s")
+        scenario["vs_baseline"] = {key: round(value, 4) for key, value in deltas.items()}
+    return regressions
+
+
+def run(args):
+    fixtures = DEFAULT_FIXTURES
+    if args.fixtures:
+        unknown = set(args.fixtures) - set(DEFAULT_FIXTURES)
+        if unknown:
+            raise ValueError(f"Unknown fixtures: {sorted(unknown)}")
+        fixtures = {name: DEFAULT_FIXTURES[name] for name in args.fixtures}
+    options = CaptureOptions(
+        readiness=args.readiness,
+        multi_viewport=not args.no_multi_viewport,
+        cache_mode="bypass",
+    )
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "fixtures": fixtures,
+            "repeat": args.repeat,
+            "readiness": options.readiness,
+            "multi_viewport": options.multi_viewport,
+        },
+        "scenarios": [],
+    }
+    with FixtureServer() as server:
+        for resolution_set in args.resolution_sets:
+            for workers in args.workers:
+                scenario = run_scenario(server, fixtures, workers, resolution_set, args.repeat, options)
+                report["scenarios"].append(scenario)
+                logger.info(
+                    "%s: %s pages/min, p50 %ss, p95 %ss, p99 %ss, peak RSS %s MB, %d failed",
+                    scenario["name"], scenario["pages_per_min"], scenario["latency_seconds"]["p50"],
+                    scenario["latency_seconds"]["p95"], scenario["latency_seconds"]["p99"],
+                    scenario["peak_rss_mb"], scenario["failed"],
+                )
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "regressions": regressions}
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info("Results written to %s", args.out)
+    for regression in regressions:
+        logger.warning("Regression: %s", regression)
+    return 1 if regressions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks", description="Benchmark the capture pipeline offline.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--resolution-set", dest="resolution_sets", action="append",
+                        help='Resolutions captured per page, separated by ";" (repeatable)')
+    parser.add_argument("--fixtures", nargs="+", choices=list(DEFAULT_FIXTURES), help="Subset of fixture pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each fixture is captured per scenario")
+    parser.add_argument("--readiness", choices=list(READINESS_POLICIES), default=DEFAULT_READINESS_POLICY)
+    parser.add_argument("--no-multi-viewport", action="store_true")
+    parser.add_argument("--out", default="benchmark.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown allowed before a scenario counts as a regression")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.resolution_sets = args.resolution_sets or DEFAULT_RESOLUTION_SETS
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    try:
+        return run(args)
+    except (ValueError, OSError) as e:
+        logger.error("%s", e)
+        return 2
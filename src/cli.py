@@ -0,0 +1,238 @@
+"""Headless batch capture from the command line.
+
+Reads a JSONL or CSV manifest of URLs and resolutions, captures them
+concurrently with the same engine as the Streamlit app, and writes the
+images plus a results.jsonl to the output directory. results.jsonl is
+also the checkpoint: running the same command again skips every capture
+that already succeeded.
+
+    python -m src.cli manifest.jsonl --out captures/ --workers 4
+
+This module must not import Streamlit.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from urllib.parse import urlparse
+
+from .config.constants import (
+    READINESS_POLICIES, DEFAULT_READINESS_POLICY, CACHE_MODES, REQUEST_BLOCKING_PROFILES, DEFAULT_BLOCKING_PROFILE,
+    OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, DEFAULT_OUTPUT_QUALITY, MAX_TASKS_PER_HOST,
+)
+from .utils.browser_pool import BrowserPool, get_browser_pool
+from .utils.capture_engine import CaptureEngine, CaptureTask
+from .utils.encoding import encode_results
+from .utils.scheduler import HostScheduler
+from .utils.screenshot import CaptureOptions
+from .utils.telemetry import start_metrics_server
+from .utils.validation import parse_resolution, validate_url
+
+logger = logging.getLogger("bender.cli")
+
+DEFAULT_RESOLUTION = "Desktop (1920x1080)"
+RESULTS_FILENAME = "results.jsonl"
+
+
+class ManifestError(Exception):
+    """Raised when the manifest cannot be parsed"""
+
+
+def _split_resolutions(value):
+    if isinstance(value, str):
+        return [part for part in re.split(r"[;|]", value) if part.strip()]
+    return list(value or [])
+
+
+def read_manifest(path, default_resolutions):
+    """Yield a CaptureTask for every URL x resolution in a JSONL or CSV manifest.
+
+    JSONL lines look like {"url": "...", "resolutions": ["Mobile (375x667)", "1200x800"]};
+    CSV files have a url column and an optional resolutions column separated by ";".
+    Entries without resolutions use default_resolutions.
+    """
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            entries = ((row.get("url", ""), row.get("resolutions")) for row in csv.DictReader(f))
+        else:
+            entries = _read_jsonl_entries(f, path)
+
+        for url, resolutions in entries:
+            url = (url or "").strip()
+            if not validate_url(url):
+                logger.warning("Skipping invalid URL in manifest: %r", url)
+                continue
+            for name, width, height in [parse_resolution(r) for r in _split_resolutions(resolutions)] or default_resolutions:
+                yield CaptureTask(url, name, width, height)
+
+
+def _read_jsonl_entries(f, path):
+    for line_number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            raise ManifestError(f"{path}:{line_number}: invalid JSON ({e})")
+        if isinstance(entry, str):
+            entry = {"url": entry}
+        yield entry.get("url", ""), entry.get("resolutions")
+
+
+def load_checkpoint(results_path):
+    """Return the (url, resolution_name) pairs already captured successfully"""
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Última línea a medio escribir tras una interrupción
+            if record.get("status") == "ok":
+                done.add((record["url"], record["resolution"]))
+    return done
+
+
+def image_filename(task, extension="png"):
+    """Stable, unique file name for a capture"""
+    domain = urlparse(task.url).netloc.replace(":", "_")
+    device = re.sub(r"[^a-z0-9]+", "-", task.resolution_name.lower()).strip("-")
+    digest = hashlib.sha1(f"{task.url}|{task.resolution_name}".encode("utf-8")).hexdigest()[:10]
+    return f"{domain}_{device}_{digest}.{extension}"
+
+
+def run(args):
+    default_resolutions = [parse_resolution(r) for r in args.resolutions]
+    images_dir = os.path.join(args.out, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    results_path = os.path.join(args.out, RESULTS_FILENAME)
+
+    done = load_checkpoint(results_path)
+    tasks = [
+        task for task in read_manifest(args.manifest, default_resolutions)
+        if (task.url, task.resolution_name) not in done
+    ]
+    if done:
+        logger.info("Resuming: %d captures already done, %d left", len(done), len(tasks))
+    if not tasks:
+        logger.info("Nothing to capture")
+        return 0
+
+    options = CaptureOptions(
+        readiness=args.readiness,
+        multi_viewport=not args.no_multi_viewport,
+        cache_mode=args.cache_mode,
+        blocking=args.blocking,
+        output_format=args.format,
+        output_quality=args.quality,
+        max_dimension=args.max_dimension,
+        png_optimize=args.optimize_png,
+        incremental=args.incremental,
+    )
+    if args.metrics_port:
+        start_metrics_server("127.0.0.1", args.metrics_port)
+    failed = 0
+    if args.workers:
+        # Un navegador por worker: el pool global se dimensiona según la máquina, no según --workers
+        pool = BrowserPool(min_size=args.workers, max_size=args.workers)
+        pool.warm_up()
+    else:
+        pool = get_browser_pool()
+    scheduler = HostScheduler(per_host_limit=args.per_host) if args.per_host is not None else None
+    engine = CaptureEngine(workers=args.workers, pool=pool, scheduler=scheduler)
+    try:
+        with open(results_path, "a") as results:
+            captures = encode_results(engine.map(tasks, options), options)
+            for index, (result, data, encoding) in enumerate(captures, start=1):
+                record = {
+                    "url": result.task.url,
+                    "resolution": result.task.resolution_name,
+                    "width": result.task.width,
+                    "height": result.task.height,
+                    "duration": round(result.duration, 3),
+                    "metadata": result.metadata,
+                }
+                if result.ok:
+                    record["metadata"] = {**result.metadata, "encoding": encoding}
+                    filename = image_filename(result.task, encoding["extension"])
+                    with open(os.path.join(images_dir, filename), "wb") as image:
+                        image.write(data)
+                    record.update(status="ok", path=os.path.join("images", filename))
+                    if result.metadata.get("change", {}).get("status") == "unchanged":
+                        record["change"] = "unchanged"
+                else:
+                    failed += 1
+                    record.update(status="failed", error=result.error)
+
+                # Cada línea se escribe completa y a disco: es el checkpoint para reanudar
+                results.write(json.dumps(record) + "\n")
+                results.flush()
+                os.fsync(results.fileno())
+                logger.info("[%d/%d] %s %s (%s)", index, len(tasks), record.get("change", record["status"]), result.task.url, result.task.resolution_name)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; run the same command again to resume")
+        # Los workers son daemon: esperar a que devuelvan sus navegadores para cerrarlos
+        engine.shutdown(cancel=True)
+        return 130
+    finally:
+        pool.close()
+
+    logger.info("Finished: %d captured, %d failed", len(tasks) - failed, failed)
+    if options.cache_mode != "bypass":
+        stats = engine.cache.stats()
+        logger.info("Capture cache: %d hits, %d misses (%.0f%% hit rate), %d entries, %.1f MB",
+                    stats["hits"], stats["misses"], stats["hit_rate"] * 100, stats["entries"],
+                    stats["size_bytes"] / (1024 * 1024))
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Capture website screenshots in batch.")
+    parser.add_argument("manifest", help="JSONL or CSV manifest of URLs (and optional resolutions)")
+    parser.add_argument("--out", default="captures", help="Output directory for images and results.jsonl")
+    parser.add_argument("--resolutions", nargs="+", default=[DEFAULT_RESOLUTION],
+                        help="Default resolutions: names from the app or WIDTHxHEIGHT")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent browsers (default: based on CPU and RAM)")
+    parser.add_argument("--per-host", type=int, default=None,
+                        help=f"Pages of the same host captured at once (default: {MAX_TASKS_PER_HOST}, 0: no limit)")
+    parser.add_argument("--readiness", choices=list(READINESS_POLICIES), default=DEFAULT_READINESS_POLICY)
+    parser.add_argument("--cache-mode", choices=list(CACHE_MODES), default="use")
+    parser.add_argument("--blocking", choices=list(REQUEST_BLOCKING_PROFILES), default=DEFAULT_BLOCKING_PROFILE,
+                        help="Request blocking profile (ads, trackers, widgets, video)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default=DEFAULT_OUTPUT_FORMAT,
+                        help="Image format of the saved captures")
+    parser.add_argument("--quality", type=int, default=DEFAULT_OUTPUT_QUALITY, help="Quality for lossy WebP and JPEG")
+    parser.add_argument("--max-dimension", type=int, default=0,
+                        help="Scale captures down so their longest side is at most this many pixels")
+    parser.add_argument("--optimize-png", action="store_true", help="Recompress PNG output losslessly")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse the previous image of pages that have not changed since the last run")
+    parser.add_argument("--no-multi-viewport", action="store_true",
+                        help="Reload the page for every resolution instead of re-emulating the viewport")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this local port while the batch runs")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    try:
+        return run(args)
+    except (ManifestError, ValueError, OSError) as e:
+        logger.error("%s", e)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
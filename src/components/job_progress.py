@@ -0,0 +1,126 @@
+import streamlit as st
+import time
+import random
+from dataclasses import replace
+from urllib.parse import urlparse
+from ..config.constants import JOB_POLL_INTERVAL
+from ..utils.jobs import get_job_runner, ACTIVE_JOB_STATUSES, JOB_FAILED
+
+# Random messages to show during the capture
+PROGRESS_MESSAGES = [
+    "🤖 Preparing the capturing robots...",
+    "📸 Adjusting the virtual lens...",
+    "🎨 Mixing the perfect pixels...",
+    "🚀 Starting the capture engines...",
+    "🎯 Aiming at the target...",
+    "🌈 Calibrating the colors...",
+    "🔍 Focusing on the page...",
+    "⚡ Loading superpowers...",
+    "🎪 Preparing the show...",
+    "🎭 Putting on the capture mask..."
+]
+
+def load_job_results(job_id):
+    """Load the screenshots of a finished job into the session"""
+    runner = get_job_runner()
+    screenshots_data = {}
+    for task in runner.store.list_tasks(job_id, status="done"):
+        # Only lightweight references live in the session; the images stay on disk
+        try:
+            ref = runner.blob_ref(task)
+        except (OSError, ValueError):
+            continue  # Blob removed by garbage collection
+        if task["thumbnail"]:
+            ref = replace(ref, metadata={**ref.metadata, "thumbnail": task["thumbnail"]})
+        screenshots_data.setdefault(task["url"], {})[task["resolution_name"]] = ref
+
+    st.session_state.screenshots_data = screenshots_data
+    st.session_state.show_results = bool(screenshots_data)
+    st.session_state.loaded_job = job_id
+    # Start the new results on the first page with nothing opened
+    st.session_state.pop("results_page", None)
+    st.session_state.full_size_result = None
+
+def display_event(task):
+    """Display a single finished task in the progress feed"""
+    domain = urlparse(task["url"]).netloc
+    if task["status"] == "done" and task["metadata"].get("change", {}).get("status") == "unchanged":
+        st.text(f"⏸️ {domain} - {task['resolution_name']} unchanged ({task['duration']:.1f}s)")
+    elif task["status"] == "done":
+        st.text(f"✅ {domain} - {task['resolution_name']} ({task['duration']:.1f}s)")
+    else:
+        st.text(f"❌ {domain} - {task['resolution_name']}: {task['error']}")
+
+def job_progress_section():
+    """Component showing the progress of the current background capture job"""
+    job_id = st.session_state.get("current_job")
+    if not job_id:
+        return
+
+    runner = get_job_runner()
+    job = runner.store.get_job(job_id)
+    if job is None:
+        st.session_state.current_job = None
+        return
+
+    with st.container():
+        st.markdown("<div class='section-container'>", unsafe_allow_html=True)
+        st.subheader("Capture Progress")
+
+        processed = job["completed"] + job["failed"]
+        progress = processed / job["total"] if job["total"] else 1.0
+        st.progress(round(progress, 2))
+        st.caption(f"{processed} of {job['total']} captures processed · {job['failed']} failed")
+
+        # Latest finished tasks, newest first
+        for task in reversed(runner.store.list_events(job_id, limit=5)):
+            display_event(task)
+
+        if job["status"] in ACTIVE_JOB_STATUSES:
+            st.markdown(f"<p style='text-align: center'>{random.choice(PROGRESS_MESSAGES)}</p>", unsafe_allow_html=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+            # The job keeps running in the background; poll again shortly
+            time.sleep(JOB_POLL_INTERVAL)
+            st.rerun()
+
+        if job["status"] == JOB_FAILED:
+            st.error(f"The capture job stopped unexpectedly: {job['error']}")
+
+        done_tasks = runner.store.list_tasks(job_id, status="done")
+        cached = sum(1 for task in done_tasks if task["metadata"].get("cache") == "hit")
+        if cached:
+            st.caption(f"♻️ {cached} of {job['total']} captures served from cache")
+        unchanged = sum(1 for task in done_tasks if task["metadata"].get("change", {}).get("status") == "unchanged")
+        if unchanged:
+            st.caption(f"⏸️ {unchanged} of {job['total']} captures unchanged since the previous run")
+        blocked = sum(task["metadata"].get("network", {}).get("blocked", 0) for task in done_tasks)
+        if blocked:
+            st.caption(f"🚫 {blocked:,} ad, tracker and widget requests blocked")
+
+        failed_tasks = runner.store.list_tasks(job_id, status="failed")
+        if failed_tasks:
+            by_class = {}
+            for task in failed_tasks:
+                failure_class = task["metadata"].get("failure", {}).get("class", "error")
+                by_class[failure_class] = by_class.get(failure_class, 0) + 1
+            breakdown = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in sorted(by_class.items()))
+            st.warning(f"⚠️ {len(failed_tasks)} of {job['total']} captures failed ({breakdown})")
+            with st.expander("View errors", expanded=False):
+                for task in failed_tasks:
+                    failure = task["metadata"].get("failure", {})
+                    attempts = f", {failure['attempts']} attempts" if failure.get("attempts", 0) > 1 else ""
+                    st.text(
+                        f"{task['url']} ({task['resolution_name']}): "
+                        f"[{failure.get('class', 'error')}{attempts}] {task['error']}"
+                    )
+
+        if st.session_state.get("loaded_job") != job_id:
+            load_job_results(job_id)
+            if st.session_state.screenshots_data and not failed_tasks:
+                # Celebration effects
+                st.balloons()
+                st.success("All captures have been completed successfully! 🎉")
+            elif not st.session_state.screenshots_data:
+                st.error("Could not capture any screenshot. Please check the installation of Chrome and ChromeDriver.")
+
+        st.markdown("</div>", unsafe_allow_html=True)
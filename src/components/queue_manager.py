@@ -1,101 +1,34 @@
 import streamlit as st
-import time
-import random
-from ..config.constants import RESOLUTIONS
+from ..config.constants import (
+    RESOLUTIONS, READINESS_POLICIES, DEFAULT_READINESS_POLICY, CACHE_MODES, QUEUE_PAGE_SIZE,
+    REQUEST_BLOCKING_PROFILES, DEFAULT_BLOCKING_PROFILE, JOB_PRIORITIES, DEFAULT_JOB_PRIORITY,
+    OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, DEFAULT_OUTPUT_QUALITY,
+)
 from ..utils.validation import validate_resolution
-from ..utils.screenshot import setup_webdriver, capture_screenshot
+from ..utils.jobs import JobQueueFull, get_job_runner
+from ..utils.screenshot import CaptureOptions
 import os
 
-# Mensajes divertidos para el proceso de captura
-LOADING_MESSAGES = [
-    "🤖 Preparando los robots capturadores...",
-    "📸 Ajustando el lente virtual...",
-    "🎨 Mezclando los píxeles perfectos...",
-    "🚀 Iniciando los motores de captura...",
-    "🎯 Apuntando al objetivo...",
-    "🌈 Calibrando los colores...",
-    "🔍 Enfocando la página...",
-    "⚡ Cargando los súper poderes...",
-    "🎪 Preparando el espectáculo...",
-    "🎭 Poniéndonos la máscara de captura...",
-]
-
-def process_screenshots(selected_resolutions):
-    """Process screenshots for all URLs in queue"""
-    st.session_state.screenshots_data = {}
-    
-    # Create a container for the progress bar
-    progress_placeholder = st.empty()
-    message_placeholder = st.empty()  # Keep this for loading messages
-    
-    driver = setup_webdriver()
-    if driver is None:
-        st.error("Could not initialize the browser. Please check the installation of Chrome and ChromeDriver.")
-        return
-        
-    total_tasks = len(st.session_state.urls_queue) * len(selected_resolutions)
-    completed_tasks = 0
-    
+def submit_screenshots(selected_resolutions, options=None):
+    """Submit a background capture job for all URLs in queue"""
+    resolutions = {name: RESOLUTIONS[name] for name in selected_resolutions}
     try:
-        for url_idx, url in enumerate(st.session_state.urls_queue):
-            st.session_state.screenshots_data[url] = {}
-            
-            for res_idx, resolution_name in enumerate(selected_resolutions):
-                # Capture screenshot
-                width, height = RESOLUTIONS[resolution_name]
-                
-                # Random messages to show during the capture
-                loading_messages = [
-                    "🤖 Preparing the capturing robots...",
-                    "📸 Adjusting the virtual lens...",
-                    "🎨 Mixing the perfect pixels...",
-                    "🚀 Starting the capture engines...",
-                    "🎯 Aiming at the target...",
-                    "🌈 Calibrating the colors...",
-                    "🔍 Focusing on the page...",
-                    "⚡ Loading superpowers...",
-                    "🎪 Preparing the show...",
-                    "🎭 Putting on the capture mask..."
-                ]
-                
-                # Start the capture and measure the time
-                start_time = time.time()
-                
-                # Capture the screenshot
-                screenshot = capture_screenshot(driver, url, width, height)
-                
-                # Calculate the time taken for the capture
-                elapsed_time = time.time() - start_time
-                
-                # Update the progress bar
-                for i in range(10):  # 10 steps for the progress bar
-                    progress = (completed_tasks + (i + 1) / 10) / total_tasks
-                    progress_placeholder.progress(round(progress, 2))
-                    time.sleep(elapsed_time / 10)  # Synchronize with the capture time
-                    
-                    # Change the loading message
-                    message_placeholder.markdown(f"<p style='text-align: center'>{random.choice(loading_messages)}</p>", unsafe_allow_html=True)
-                
-                if screenshot:
-                    st.session_state.screenshots_data[url][resolution_name] = screenshot
-                completed_tasks += 1
-            
-            if completed_tasks > 0:
-                # Show final progress
-                progress_placeholder.progress(1.0)
-                message_placeholder.markdown("<p style='text-align: center'>All captures have been processed successfully</p>", unsafe_allow_html=True)
-                
-                # Celebration effects
-                st.balloons()
-                st.success("All captures have been completed successfully! 🎉")
-                
-                st.session_state.show_results = True
-                time.sleep(1)
-                st.rerun()
+        job_id = get_job_runner().submit(
+            st.session_state.urls_queue,
+            resolutions,
+            options,
+            session_id=st.session_state.session_id,
+        )
+    except JobQueueFull:
+        st.error("There are too many capture jobs running right now. Please try again in a moment.")
+        return
     
-    finally:
-        if driver:
-            driver.quit()
+    st.session_state.current_job = job_id
+    st.session_state.screenshots_data = {}
+    st.session_state.show_results = False
+    # Keep the job in the URL so a page refresh picks it up again
+    st.experimental_set_query_params(job=job_id)
+    st.rerun()
 
 def queue_manager_section():
     """Component for managing URL queue and screenshot settings"""
@@ -111,8 +44,17 @@ def queue_manager_section():
             st.success(st.session_state.processing_message)
 
         # Make the URL Queue collapsible
-        with st.expander("View Queue", expanded=False):
-            for idx, url in enumerate(st.session_state.urls_queue):
+        queue_size = len(st.session_state.urls_queue)
+        with st.expander(f"View Queue ({queue_size:,} URLs)", expanded=False):
+            # Only one page of rows is rendered, so huge queues stay responsive
+            total_pages = (queue_size - 1) // QUEUE_PAGE_SIZE + 1
+            page = 1
+            if total_pages > 1:
+                if st.session_state.get("queue_page", 1) > total_pages:
+                    st.session_state.queue_page = total_pages
+                page = st.number_input("Queue page", min_value=1, max_value=total_pages, value=1, key="queue_page")
+            start = (page - 1) * QUEUE_PAGE_SIZE
+            for idx, url in enumerate(st.session_state.urls_queue[start:start + QUEUE_PAGE_SIZE], start=start):
                 col1, col2 = st.columns([4, 1])
                 with col1:
                     st.text(f"{idx + 1}. {url}")
@@ -123,6 +65,7 @@ def queue_manager_section():
         
             if st.button("Clear Queue", type="secondary", key="clear_queue", help="Remove all URLs", use_container_width=True):
                 st.session_state.urls_queue = []
+                st.session_state.pop("queue_page", None)
                 st.rerun()
         
         # Screenshot Settings Section
@@ -150,9 +93,86 @@ def queue_manager_section():
         elif custom_resolution:
             st.error("Invalid resolution format. Use WIDTHxHEIGHT (e.g., 1200x800)")
         
+        policy_names = list(READINESS_POLICIES.keys())
+        readiness = st.selectbox(
+            "Page Readiness",
+            options=policy_names,
+            index=policy_names.index(DEFAULT_READINESS_POLICY),
+            help="How long to wait before capturing: 'fast' for static pages, 'thorough' for heavy SPAs"
+        )
+        
+        multi_viewport = st.checkbox(
+            "Load each page once for all resolutions",
+            value=True,
+            help="Faster. Disable for sites that serve different HTML to mobile and desktop browsers"
+        )
+        
+        cache_mode = st.selectbox(
+            "Capture Cache",
+            options=list(CACHE_MODES.keys()),
+            format_func=CACHE_MODES.get,
+            help="Reuse recent captures of the same URL and settings, or force fresh ones"
+        )
+        
+        blocking_profiles = list(REQUEST_BLOCKING_PROFILES.keys())
+        blocking = st.selectbox(
+            "Request Blocking",
+            options=blocking_profiles,
+            index=blocking_profiles.index(DEFAULT_BLOCKING_PROFILE),
+            format_func=lambda name: REQUEST_BLOCKING_PROFILES[name]["label"],
+            help="Skip ads, trackers and other third-party requests that slow pages down without changing what you need to see"
+        )
+        
+        priorities = list(JOB_PRIORITIES.keys())
+        priority = st.selectbox(
+            "Priority",
+            options=priorities,
+            index=priorities.index(DEFAULT_JOB_PRIORITY),
+            format_func=lambda name: JOB_PRIORITIES[name]["label"],
+            help="High priority jobs are captured before normal and low ones that are already running"
+        )
+        
+        incremental = st.checkbox(
+            "Only re-capture changed pages",
+            value=False,
+            help="Compare with the previous capture of each URL and reuse it when the page has not changed"
+        )
+        
+        output_formats = list(OUTPUT_FORMATS.keys())
+        output_format = st.selectbox(
+            "Output Format",
+            options=output_formats,
+            index=output_formats.index(DEFAULT_OUTPUT_FORMAT),
+            format_func=lambda name: OUTPUT_FORMATS[name]["label"],
+            help="WebP and JPEG files are much smaller than PNG, which makes downloads and ZIPs faster"
+        )
+        output_quality = DEFAULT_OUTPUT_QUALITY
+        png_optimize = False
+        if not OUTPUT_FORMATS[output_format]["lossless"]:
+            output_quality = st.slider("Quality", min_value=30, max_value=100, value=DEFAULT_OUTPUT_QUALITY)
+        elif output_format == "png":
+            png_optimize = st.checkbox(
+                "Optimize PNG",
+                value=False,
+                help="Recompress the PNG without losing quality; smaller files but slower to process"
+            )
+        max_dimension = st.number_input(
+            "Max image size (px, 0 = original)",
+            min_value=0,
+            max_value=65000,
+            value=0,
+            step=500,
+            help="Scale captures down so their longest side is at most this many pixels"
+        )
+        
         if st.button("🚀 Generate Screenshots", type="primary", disabled=not selected_resolutions, use_container_width=True):
             st.session_state.processing_message = "Processing URLs..."
-            process_screenshots(selected_resolutions)
+            options = CaptureOptions(
+                readiness=readiness, multi_viewport=multi_viewport, cache_mode=cache_mode, blocking=blocking,
+                priority=priority, output_format=output_format, output_quality=output_quality,
+                max_dimension=int(max_dimension), png_optimize=png_optimize, incremental=incremental,
+            )
+            submit_screenshots(selected_resolutions, options)
         
         st.markdown("</div>", unsafe_allow_html=True)
 
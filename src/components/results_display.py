@@ -1,12 +1,17 @@
 import streamlit as st
+import os
 from datetime import datetime
 from urllib.parse import urlparse
-from ..utils.screenshot import create_thumbnail, create_zip_file
+from ..config.constants import RESULTS_PAGE_SIZE, RESULTS_COLUMNS
+from ..utils.blob_store import get_blob_store
+from ..utils.jobs import get_job_runner
 
 def clear_results():
     """Limpia los resultados y reinicia el estado"""
     st.session_state.screenshots_data = {}
     st.session_state.show_results = False
+    st.session_state.current_job = None
+    st.experimental_set_query_params()
     st.rerun()
 
 def get_device_name(resolution_name):
@@ -20,13 +25,41 @@ def get_device_name(resolution_name):
     else:
         return "📱 Custom"
 
-def display_screenshot(url, screenshot_data, resolution_name):
-    """Display a single screenshot with its resolution name"""
+def display_screenshot(url, screenshot_ref, resolution_name):
+    """Display the preview of a single screenshot with its resolution name"""
     device = get_device_name(resolution_name)
     domain = urlparse(url).netloc
+    blobs = get_blob_store()
     
-    with st.expander(f"{domain} - {device}", expanded=False):
-        st.image(screenshot_data, use_column_width=True)
+    # Streamlit reads the image straight from the blob store file
+    preview_path = blobs.path(screenshot_ref)
+    thumbnail_key = screenshot_ref.metadata.get("thumbnail")
+    if thumbnail_key:
+        try:
+            preview_path = blobs.path(blobs.ref(thumbnail_key))
+        except (OSError, ValueError):
+            pass  # Sin miniatura se muestra la imagen completa
+    if not os.path.exists(preview_path):
+        st.info(f"{domain} - {device}: this screenshot has expired")
+        return
+    st.image(preview_path, caption=f"{domain} - {device}", use_column_width=True)
+    if st.button("🔍 Full size", key=f"full_{screenshot_ref.key}", use_container_width=True):
+        st.session_state.full_size_result = screenshot_ref.key
+
+def display_full_size(url, screenshot_ref, resolution_name):
+    """Display the full-resolution image of the screenshot the user opened"""
+    device = get_device_name(resolution_name)
+    domain = urlparse(url).netloc
+    
+    with st.expander(f"{domain} - {device}", expanded=True):
+        path = get_blob_store().path(screenshot_ref)
+        if os.path.exists(path):
+            st.image(path, use_column_width=True)
+        else:
+            st.info("This screenshot has expired")
+        if st.button("Close", key="close_full_size", type="secondary"):
+            st.session_state.full_size_result = None
+            st.rerun()
 
 def results_section():
     """Component for displaying screenshot results"""
@@ -36,23 +69,58 @@ def results_section():
         # Header con botones de acción
         col1, col2 = st.columns([1, 4])
         with col1:
-            # Botón de descarga ZIP
-            st.download_button(
-                "📦 Download ZIP",
-                data=create_zip_file(st.session_state.screenshots_data),
-                file_name=f"screenshots_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                mime="application/zip",
-                use_container_width=True
-            )
+            # Botón de descarga ZIP: el archivo ya se construyó en disco durante el job
+            job_id = st.session_state.get("current_job")
+            archive_path = get_job_runner().archive_path(job_id) if job_id else None
+            if archive_path and st.session_state.get("download_prepared") == job_id:
+                # download_button copia el archivo entero en memoria: solo en la ejecución
+                # en que el usuario lo pidió, no en cada rerun de la vista de resultados
+                st.session_state.download_prepared = None
+                job = get_job_runner().store.get_job(job_id)
+                with open(archive_path, "rb") as archive:
+                    st.download_button(
+                        "📦 Download ZIP",
+                        data=archive,
+                        file_name=f"screenshots_{datetime.fromtimestamp(job['created_at']).strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip",
+                        use_container_width=True
+                    )
+            elif archive_path:
+                if st.button("📦 Prepare ZIP", key="prepare_zip", use_container_width=True):
+                    st.session_state.download_prepared = job_id
+                    st.rerun()
         with col2:
             # Botón para limpiar resultados
             if st.button("Clear Results", type="secondary", key="clear_results", use_container_width=True):
-                st.session_state.screenshots_data = {}
-                st.rerun()
+                clear_results()
+        
+        entries = [
+            (url, screenshot_ref, resolution_name)
+            for url, resolutions in st.session_state.screenshots_data.items()
+            for resolution_name, screenshot_ref in resolutions.items()
+        ]
+        
+        # Full-size image, loaded only when the user asks for it
+        full_size_key = st.session_state.get("full_size_result")
+        for url, screenshot_ref, resolution_name in entries:
+            if screenshot_ref.key == full_size_key:
+                display_full_size(url, screenshot_ref, resolution_name)
+        
+        # Paginated grid of previews
+        total_pages = (len(entries) - 1) // RESULTS_PAGE_SIZE + 1
+        page = 1
+        if total_pages > 1:
+            if st.session_state.get("results_page", 1) > total_pages:
+                st.session_state.results_page = total_pages
+            page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, key="results_page")
+            st.caption(f"Page {page} of {total_pages} · {len(entries)} screenshots")
+        page_entries = entries[(page - 1) * RESULTS_PAGE_SIZE:page * RESULTS_PAGE_SIZE]
         
-        # Display screenshots
-        for url, resolutions in st.session_state.screenshots_data.items():
-            for resolution_name, screenshot_data in resolutions.items():
-                display_screenshot(url, screenshot_data, resolution_name)
+        for row_start in range(0, len(page_entries), RESULTS_COLUMNS):
+            columns = st.columns(RESULTS_COLUMNS)
+            for column, (url, screenshot_ref, resolution_name) in zip(columns, page_entries[row_start:row_start + RESULTS_COLUMNS]):
+                with column:
+                    get_blob_store().touch(screenshot_ref.namespace)
+                    display_screenshot(url, screenshot_ref, resolution_name)
         
         st.markdown("</div>", unsafe_allow_html=True) 
\ No newline at end of file
@@ -1,5 +1,6 @@
+import itertools
 import streamlit as st
-from ..utils.validation import validate_url
+from ..utils.ingestion import ingest_urls, iter_uploaded_urls
 
 def show_help_modal():
     st.markdown("""
@@ -31,8 +32,8 @@ def url_input_section():
         # Drag and drop file uploader
         uploaded_file = st.file_uploader(
             "Or upload a CSV file with URLs",
-            type=["csv", "txt"],
-            help="Upload a file containing one URL per line",
+            type=["csv", "txt", "xml", "gz"],
+            help="Upload a file containing one URL per line, or a sitemap XML (gzip supported)",
             label_visibility="collapsed"
         )
         
@@ -41,7 +42,8 @@ def url_input_section():
             st.markdown("""
                 To upload a CSV file, please follow these guidelines:
                 - The file should contain one URL per line.
-                - Ensure that the file is in CSV format.
+                - CSV, TXT and sitemap XML files are supported, also gzipped (`.gz`).
+                - Duplicate URLs are skipped automatically.
                 - The maximum file size is 200MB.
                 - Example of a valid CSV file:
                   ```
@@ -51,18 +53,27 @@ def url_input_section():
             """)
         
         if st.button("Add to Queue", type="primary"):
-            new_urls = []
+            raw_urls = []
             if url_input:
-                new_urls.extend([url.strip() for url in url_input.split('\n') if url.strip()])
+                raw_urls.extend([url.strip() for url in url_input.split('\n') if url.strip()])
             if uploaded_file:
-                new_urls.extend(uploaded_file.read().decode("utf-8").splitlines())
+                # Stream the file instead of decoding it all at once
+                raw_urls = itertools.chain(raw_urls, iter_uploaded_urls(uploaded_file, uploaded_file.name))
             
-            valid_urls = [url for url in new_urls if validate_url(url)]
-            st.session_state.urls_queue.extend(valid_urls)
+            progress_placeholder = st.empty()
+            summary = ingest_urls(
+                raw_urls,
+                existing=st.session_state.urls_queue,
+                on_batch=lambda batch_summary: progress_placeholder.caption(f"Processed {batch_summary.total:,} URLs..."),
+            )
+            progress_placeholder.empty()
+            st.session_state.urls_queue.extend(summary.urls)
             
-            if valid_urls:
-                st.success(f"✅ Added {len(valid_urls)} URLs to the queue")
-                if len(new_urls) > len(valid_urls):
-                    st.warning(f"⚠️ {len(new_urls) - len(valid_urls)} invalid URLs were skipped")
+            if summary.added:
+                st.success(f"✅ Added {summary.added:,} URLs to the queue")
+            if summary.duplicates:
+                st.info(f"ℹ️ {summary.duplicates:,} duplicate URLs were skipped")
+            if summary.invalid:
+                st.warning(f"⚠️ {summary.invalid:,} invalid URLs were skipped (e.g. {', '.join(summary.invalid_samples[:3])})")
         
         st.markdown("</div>", unsafe_allow_html=True) 
\ No newline at end of file
@@ -1,4 +1,8 @@
 """Constants for the application"""
+import os
+
+# Directorio donde se guardan jobs, capturas y demás datos persistentes
+DATA_DIR = os.environ.get("BENDER_DATA_DIR", os.path.join(os.path.expanduser("~"), ".bender"))
 
 # Available resolutions
 RESOLUTIONS = {
@@ -7,6 +11,46 @@ RESOLUTIONS = {
     "Desktop (1920x1080)": (1920, 1080),
 }
 
+# User agent de escritorio "común" usado por defecto
+DESKTOP_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36"
+)
+
+# Device emulation per resolution family, applied through DevTools when a page
+# is captured at several resolutions from a single load. Custom resolutions
+# use the family whose max_width fits the requested width.
+# device_scale_factor 1 keeps the image size equal to the requested resolution.
+DEVICE_PROFILES = {
+    "Mobile": {
+        "max_width": 767,
+        "mobile": True,
+        "device_scale_factor": 1,
+        "platform": "iPhone",
+        "user_agent": (
+            "Mozilla/5.0 (iPhone; CPU iPhone OS 16_6 like Mac OS X) AppleWebKit/605.1.15 "
+            "(KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1"
+        ),
+    },
+    "Tablet": {
+        "max_width": 1279,
+        "mobile": True,
+        "device_scale_factor": 1,
+        "platform": "iPad",
+        "user_agent": (
+            "Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 "
+            "(KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1"
+        ),
+    },
+    "Desktop": {
+        "max_width": None,
+        "mobile": False,
+        "device_scale_factor": 1,
+        "platform": "Win32",
+        "user_agent": DESKTOP_USER_AGENT,
+    },
+}
+
 # Chrome options for webdriver
 CHROME_OPTIONS = [
     "--headless=new",
@@ -26,10 +70,217 @@ CHROME_OPTIONS = [
     "--disable-blink-features=AutomationControlled",
 
     # Ejemplo de cambiar el user agent a uno "común"
-    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-    "(KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36"
+    f"--user-agent={DESKTOP_USER_AGENT}"
+]
+
+# Request blocking profiles, applied per page through DevTools (Network.setBlockedURLs).
+# url_patterns usan comodines "*"; resource_types se traducen a patrones con
+# BLOCKED_RESOURCE_TYPE_PATTERNS porque setBlockedURLs solo filtra por URL.
+_TRACKER_PATTERNS = [
+    "*doubleclick.net/*", "*googlesyndication.com/*", "*googleadservices.com/*",
+    "*google-analytics.com/*", "*googletagmanager.com/*", "*googletagservices.com/*",
+    "*connect.facebook.net/*", "*facebook.com/tr*", "*amazon-adsystem.com/*", "*adnxs.com/*",
+    "*adsrvr.org/*", "*criteo.com/*", "*criteo.net/*", "*taboola.com/*", "*outbrain.com/*",
+    "*scorecardresearch.com/*", "*quantserve.com/*", "*hotjar.com/*", "*clarity.ms/*",
+    "*mixpanel.com/*", "*cdn.segment.com/*", "*api.segment.io/*", "*amplitude.com/*",
+    "*bat.bing.com/*", "*snap.licdn.com/*", "*analytics.tiktok.com/*", "*nr-data.net/*",
+    "*js-agent.newrelic.com/*",
+]
+_WIDGET_PATTERNS = [
+    "*widget.intercom.io/*", "*js.intercomcdn.com/*", "*static.zdassets.com/*", "*zopim.com/*",
+    "*js.driftt.com/*", "*embed.tawk.to/*", "*client.crisp.chat/*", "*cdn.livechatinc.com/*",
+    "*js.hs-scripts.com/*", "*youtube.com/embed/*", "*youtube-nocookie.com/embed/*",
+    "*player.vimeo.com/*",
+]
+BLOCKED_RESOURCE_TYPE_PATTERNS = {
+    "Media": ["*.mp4", "*.mp4?*", "*.webm", "*.webm?*", "*.m3u8*", "*.mpd", "*.mpd?*", "*.ogv", "*.mov"],
+}
+REQUEST_BLOCKING_PROFILES = {
+    "none": {
+        "label": "Block nothing",
+        "url_patterns": [],
+        "resource_types": [],
+    },
+    "trackers": {
+        "label": "Block ads and analytics",
+        "url_patterns": _TRACKER_PATTERNS,
+        "resource_types": [],
+    },
+    "aggressive": {
+        "label": "Block ads, analytics, chat widgets and video",
+        "url_patterns": _TRACKER_PATTERNS + _WIDGET_PATTERNS,
+        "resource_types": ["Media"],
+    },
+}
+DEFAULT_BLOCKING_PROFILE = "none"
+
+# Parallel capture engine
+# Cada worker mantiene su propio Chrome headless; ~500 MB por instancia es una
+# estimación conservadora para páginas pesadas.
+MAX_CAPTURE_WORKERS = 8
+CHROME_WORKER_MEMORY_MB = 500
+
+# Scheduling of pages across workers
+MAX_TASKS_PER_HOST = 2  # páginas del mismo host capturándose a la vez
+# Jobs de menor "rank" se atienden antes; dentro de un rank los hosts se alternan
+JOB_PRIORITIES = {
+    "high": {"rank": 0, "label": "High (small urgent jobs)"},
+    "normal": {"rank": 1, "label": "Normal"},
+    "low": {"rank": 2, "label": "Low (background crawls)"},
+}
+DEFAULT_JOB_PRIORITY = "normal"
+
+# Timeouts, retries and circuit breaking
+PAGE_LOAD_TIMEOUT = 30  # segundos para driver.get() antes de abandonar la página
+SCRIPT_TIMEOUT = 15  # segundos para scripts asíncronos en la página
+RETRY_MAX_ATTEMPTS = 3  # intentos por página para fallos reintentables (timeouts, red, Chrome caído)
+RETRY_BACKOFF_BASE = 2.0  # segundos; se dobla en cada reintento, con jitter
+RETRY_BACKOFF_MAX = 20.0
+CIRCUIT_BREAKER_THRESHOLD = 5  # fallos seguidos de un host antes de dejar de intentarlo
+CIRCUIT_BREAKER_COOLDOWN = 120  # segundos con el host en cortocircuito antes de probar de nuevo
+
+# Warm browser pool shared by every session in the process
+BROWSER_POOL_MIN_SIZE = 1
+BROWSER_POOL_MAX_SIZE = None  # None = default_worker_count()
+BROWSER_MAX_PAGES = 50  # reciclar el Chrome tras este número de páginas
+BROWSER_MAX_RSS_GROWTH_MB = 1024  # o cuando su memoria crece más que esto
+BROWSER_ACQUIRE_TIMEOUT = 300  # segundos esperando un navegador libre
+
+# Background jobs
+JOBS_DB_PATH = os.path.join(DATA_DIR, "jobs.sqlite3")
+JOBS_DIR = os.path.join(DATA_DIR, "jobs")
+MAX_PENDING_JOBS = 20  # jobs en cola o corriendo por proceso antes de rechazar nuevos
+# Todos los jobs aceptados alimentan el scheduler a la vez: el orden lo deciden
+# las prioridades y los límites por host, no el orden de llegada.
+MAX_CONCURRENT_JOBS = MAX_PENDING_JOBS
+JOB_POLL_INTERVAL = 1.0  # segundos entre refrescos de la UI mientras un job corre
+JOB_RETENTION = 24 * 60 * 60  # jobs terminados hace más tiempo se borran con su ZIP e imágenes
+
+# HTTP API (src/api.py)
+API_HOST = "127.0.0.1"
+API_PORT = 8502
+API_NAMESPACE = "api"  # prefijo de los namespaces del BlobStore de los jobs de la API (uno por job)
+API_RETRY_AFTER = 30  # segundos sugeridos al cliente cuando la cola está llena
+
+# Per-session blob store for capture images
+BLOB_STORE_DIR = os.path.join(DATA_DIR, "blobs")
+BLOB_SESSION_QUOTA_MB = 2048
+BLOB_SESSION_TTL = 24 * 60 * 60  # sesiones sin actividad durante este tiempo se borran
+BLOB_GC_INTERVAL = 15 * 60
+
+# Image processing (thumbnails) in a worker process pool
+IMAGE_WORKERS = None  # None = min(4, CPUs)
+THUMBNAIL_MAX_WIDTH = 480
+THUMBNAIL_MAX_ASPECT = 1.5  # las capturas más altas se recortan por arriba para la vista previa
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 75
+RESULTS_PAGE_SIZE = 12
+RESULTS_COLUMNS = 3
+
+# Output encoding of the stored captures (src/utils/encoding.py), done in the
+# same process pool. Las capturas siempre se toman en PNG y se recodifican después.
+OUTPUT_FORMATS = {
+    "png": {"label": "PNG (original)", "pil_format": "PNG", "extension": "png", "media_type": "image/png", "lossless": True},
+    "webp_lossless": {"label": "WebP (lossless)", "pil_format": "WEBP", "extension": "webp", "media_type": "image/webp", "lossless": True},
+    "webp": {"label": "WebP", "pil_format": "WEBP", "extension": "webp", "media_type": "image/webp", "lossless": False},
+    "jpeg": {"label": "JPEG", "pil_format": "JPEG", "extension": "jpg", "media_type": "image/jpeg", "lossless": False},
+}
+DEFAULT_OUTPUT_FORMAT = "png"
+DEFAULT_OUTPUT_QUALITY = 85  # calidad en formatos con pérdida; esfuerzo de compresión en WebP lossless
+WEBP_MAX_DIMENSION = 16383  # límite del formato: capturas más altas se guardan en el formato de OUTPUT_FORMAT_FALLBACK
+OUTPUT_FORMAT_FALLBACK = {"webp_lossless": "png", "webp": "jpeg"}
+
+# On-disk capture cache
+CAPTURE_CACHE_DIR = os.path.join(DATA_DIR, "cache")
+CAPTURE_CACHE_TTL = 24 * 60 * 60  # segundos
+CAPTURE_CACHE_MAX_MB = 2048
+CACHE_MODES = {
+    "use": "Use cached captures",
+    "refresh": "Refresh cache",
+    "bypass": "Bypass cache",
+}
+
+# Incremental captures: change detection against the previous run (src/utils/change_detection.py)
+CHANGE_STORE_DIR = os.path.join(DATA_DIR, "changes")
+CHANGE_STORE_TTL = 30 * 24 * 60 * 60  # capturas más antiguas se olvidan y se vuelven a comparar desde cero
+CHANGE_REUSE_MAX_AGE = 7 * 24 * 60 * 60  # imágenes renderizadas hace más tiempo no se reutilizan sin volver a renderizar
+CHANGE_CHECK_TIMEOUT = 10  # segundos de la petición condicional previa al render
+CHANGE_CHECK_MAX_MB = 5  # HTML más grande que esto no se descarga para comparar
+PHASH_SIZE = 16  # hash perceptual de PHASH_SIZE x PHASH_SIZE bits
+PHASH_MAX_DISTANCE = 2  # bits distintos tolerados entre dos capturas "iguales"
+PHASH_MAX_COLOR_DELTA = 8  # diferencia máxima (0-255) del color medio de cada celda de una rejilla 8x8
+
+# Bulk URL ingestion
+INGEST_BATCH_SIZE = 5000
+QUEUE_PAGE_SIZE = 50
+
+# Page readiness policies
+# Señales que deben cumplirse antes de capturar; "timeout" es el límite duro en segundos.
+# Un 0 en network_idle_ms o dom_quiet_ms desactiva esa comprobación.
+READINESS_POLICIES = {
+    "fast": {
+        "network_idle_ms": 300,
+        "network_max_inflight": 2,
+        "dom_quiet_ms": 300,
+        "images": False,
+        "timeout": 8.0,
+    },
+    "balanced": {
+        "network_idle_ms": 500,
+        "network_max_inflight": 0,
+        "dom_quiet_ms": 500,
+        "timeout": 15.0,
+    },
+    "thorough": {
+        "network_idle_ms": 1000,
+        "network_max_inflight": 0,
+        "dom_quiet_ms": 1000,
+        "timeout": 30.0,
+    },
+}
+DEFAULT_READINESS_POLICY = "balanced"
+
+# Cookie-consent banners (src/utils/consent.py)
+CONSENT_MEMORY_PATH = os.path.join(DATA_DIR, "consent.json")
+CONSENT_MEMORY_TTL = 86400  # segundos que se recuerda si un dominio tiene banner y su selector
+CONSENT_SETTLE_MS = 1000  # espera máxima a que el banner desaparezca tras el clic
+# Textos de botones "aceptar" (en minúsculas); un botón coincide si su texto es
+# la frase o empieza por ella seguida de un espacio.
+CONSENT_ACCEPT_PHRASES = [
+    # en
+    "accept all", "accept all cookies", "accept cookies", "accept", "allow all", "allow all cookies",
+    "allow cookies", "i accept", "agree", "i agree", "agree and close", "got it", "ok",
+    # es
+    "aceptar todo", "aceptar todas", "aceptar cookies", "aceptar", "acepto", "permitir todas", "de acuerdo", "entendido",
+    # de
+    "alle akzeptieren", "alles akzeptieren", "akzeptieren", "alle zulassen", "zustimmen", "ich stimme zu", "einverstanden",
+    # fr
+    "tout accepter", "accepter tout", "accepter et fermer", "accepter", "j'accepte", "autoriser tous", "d'accord",
+    # it
+    "accetta tutto", "accetta tutti", "accetta", "accetto", "acconsento",
+    # pt
+    "aceitar todos", "aceitar", "aceito", "concordo", "permitir todos",
+    # nl
+    "alles accepteren", "alle cookies accepteren", "accepteren", "akkoord", "ik ga akkoord",
+    # pl, sv, da
+    "zaakceptuj wszystkie", "akceptuj wszystkie", "akceptuję", "zgadzam się",
+    "acceptera alla", "godkänn alla", "jag godkänner", "accepter alle", "tillad alle",
 ]
 
+# Full-page capture
+# Por encima de FULL_PAGE_TILE_THRESHOLD px de alto la página se captura por
+# tiras de FULL_PAGE_TILE_HEIGHT px que se van cosiendo en el PNG final.
+FULL_PAGE_TILE_THRESHOLD = 10000
+FULL_PAGE_TILE_HEIGHT = 4000
+FULL_PAGE_MAX_HEIGHT = 60000  # las páginas más altas (scroll infinito) se recortan
+
+# Tracing and metrics
+TRACE_LOG_PATH = os.path.join(DATA_DIR, "trace.jsonl")  # un span por línea
+TRACE_LOG_MAX_MB = 100  # se rota a trace.jsonl.1 al superar este tamaño
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464  # /metrics del proceso de Streamlit; None lo desactiva (la API lo sirve en su propio puerto)
+METRICS_HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
 # Page configuration
 PAGE_CONFIG = {
     "page_title": "Bender - Screenshot Tool",
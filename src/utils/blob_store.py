@@ -0,0 +1,214 @@
+"""Per-session on-disk store for capture images"""
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from ..config.constants import BLOB_STORE_DIR, BLOB_SESSION_QUOTA_MB, BLOB_SESSION_TTL, BLOB_GC_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_LAST_ACCESS_FILE = ".last_access"
+_TOUCH_INTERVAL = 60  # no reescribir la marca de acceso más de una vez por minuto
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9._-]+(/[A-Za-z0-9._-]+)*$")
+
+
+class BlobQuotaExceeded(Exception):
+    """Raised when a session would go over its storage quota"""
+
+
+@dataclass(frozen=True)
+class BlobRef:
+    """Lightweight reference to a stored blob, safe to keep in st.session_state"""
+    namespace: str
+    name: str
+    size: int
+    media_type: str = "image/png"
+    metadata: dict = field(default_factory=dict, compare=False, hash=False)
+
+    @property
+    def key(self):
+        return f"{self.namespace}/{self.name}"
+
+
+class BlobStore:
+    """Store blobs on disk in one directory per session.
+
+    Each namespace (usually the Streamlit session id, or one per API job)
+    has a quota. Usage is read from disk on every write, so blobs written
+    by another process sharing the store count too; the check and the
+    write are only atomic within one process. Reads are memory-mapped and every access refreshes the namespace's last
+    access time; namespaces idle for longer than session_ttl are removed
+    by gc().
+    """
+
+    def __init__(self, root=BLOB_STORE_DIR, session_quota_bytes=BLOB_SESSION_QUOTA_MB * 1024 * 1024,
+                 session_ttl=BLOB_SESSION_TTL):
+        self.root = root
+        self.session_quota_bytes = session_quota_bytes
+        self.session_ttl = session_ttl
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._namespace_locks = {}
+        self._last_gc = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def _namespace_dir(self, namespace):
+        if not _SAFE_NAME.match(namespace) or "/" in namespace or namespace in (".", ".."):
+            raise ValueError(f"Invalid blob namespace: {namespace!r}")
+        return os.path.join(self.root, namespace)
+
+    def path(self, ref):
+        """Absolute path of a blob on disk"""
+        if not _SAFE_NAME.match(ref.name) or ".." in ref.name.split("/"):
+            raise ValueError(f"Invalid blob name: {ref.name!r}")
+        return os.path.join(self._namespace_dir(ref.namespace), ref.name)
+
+    def _namespace_lock(self, namespace):
+        with self._lock:
+            return self._namespace_locks.setdefault(namespace, threading.Lock())
+
+    def _scan_usage(self, namespace):
+        total = 0
+        for dirpath, _, filenames in os.walk(self._namespace_dir(namespace)):
+            for filename in filenames:
+                if filename.endswith(".meta.json") or filename == _LAST_ACCESS_FILE:
+                    continue
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        return total
+
+    def usage(self, namespace):
+        """Bytes currently stored for a namespace"""
+        return self._scan_usage(namespace)
+
+    def touch(self, namespace, force=False):
+        """Mark a namespace as in use so gc() keeps it"""
+        now = time.time()
+        if not force and now - self._touched.get(namespace, 0) < _TOUCH_INTERVAL:
+            return
+        self._touched[namespace] = now
+        directory = self._namespace_dir(namespace)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, _LAST_ACCESS_FILE), "w") as f:
+            f.write(str(now))
+
+    def put(self, namespace, name, data, media_type="image/png", metadata=None):
+        """Write a blob and return its BlobRef, enforcing the namespace quota"""
+        ref = BlobRef(namespace, name, len(data), media_type, metadata or {})
+        path = self.path(ref)
+        # Comprobar la cuota y escribir sin soltar el lock: dos escrituras
+        # concurrentes no pueden pasar ambas la comprobación
+        with self._namespace_lock(namespace):
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            usage = self.usage(namespace)
+            if usage - previous + len(data) > self.session_quota_bytes:
+                raise BlobQuotaExceeded(
+                    f"Session storage quota of {self.session_quota_bytes // (1024 * 1024)} MB exceeded"
+                )
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with open(f"{path}.meta.json", "w") as f:
+                json.dump({"media_type": media_type, "metadata": ref.metadata}, f)
+        self.touch(namespace)
+        self.maybe_gc()
+        return ref
+
+    def ref(self, key):
+        """Rebuild the BlobRef stored under "namespace/name" from disk.
+
+        Raises FileNotFoundError if the blob has been garbage collected.
+        """
+        namespace, _, name = key.partition("/")
+        ref = BlobRef(namespace, name, 0)
+        path = self.path(ref)
+        try:
+            with open(f"{path}.meta.json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        return BlobRef(namespace, name, os.path.getsize(path), meta.get("media_type", "image/png"), meta.get("metadata", {}))
+
+    @contextmanager
+    def open(self, ref):
+        """Memory-map a blob for reading without copying it into the heap"""
+        self.touch(ref.namespace)
+        with open(self.path(ref), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def read(self, ref):
+        """Return a blob's bytes"""
+        with self.open(ref) as mapped:
+            return bytes(mapped)
+
+    def delete_prefix(self, namespace, prefix):
+        """Delete every blob of a namespace stored under "prefix/" (e.g. a job id)"""
+        ref = BlobRef(namespace, prefix, 0)
+        with self._namespace_lock(namespace):
+            shutil.rmtree(self.path(ref), ignore_errors=True)
+
+    def delete_namespace(self, namespace):
+        shutil.rmtree(self._namespace_dir(namespace), ignore_errors=True)
+        with self._lock:
+            self._touched.pop(namespace, None)
+            self._namespace_locks.pop(namespace, None)
+
+    def gc(self):
+        """Delete namespaces that have not been accessed within session_ttl"""
+        cutoff = time.time() - self.session_ttl
+        removed = 0
+        for namespace in os.listdir(self.root):
+            directory = os.path.join(self.root, namespace)
+            if not os.path.isdir(directory):
+                continue
+            marker = os.path.join(directory, _LAST_ACCESS_FILE)
+            try:
+                last_access = os.path.getmtime(marker if os.path.exists(marker) else directory)
+            except OSError:
+                continue
+            if last_access < cutoff:
+                logger.info("Removing abandoned blob namespace %s", namespace)
+                self.delete_namespace(namespace)
+                removed += 1
+        return removed
+
+    def maybe_gc(self):
+        """Run gc() at most once every BLOB_GC_INTERVAL seconds"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_gc < BLOB_GC_INTERVAL:
+                return
+            self._last_gc = now
+        try:
+            self.gc()
+        except OSError as e:
+            logger.warning("Blob store garbage collection failed: %s", e)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """Return the process-wide BlobStore"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore()
+        return _store
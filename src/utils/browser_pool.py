@@ -0,0 +1,304 @@
+"""Process-wide pool of warm, recycled headless Chrome drivers"""
+import logging
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # Sin psutil no se recicla por memoria
+    psutil = None
+
+from ..config.constants import (
+    MAX_CAPTURE_WORKERS,
+    CHROME_WORKER_MEMORY_MB,
+    BROWSER_POOL_MIN_SIZE,
+    BROWSER_POOL_MAX_SIZE,
+    BROWSER_MAX_PAGES,
+    BROWSER_MAX_RSS_GROWTH_MB,
+    BROWSER_ACQUIRE_TIMEOUT,
+)
+from .screenshot import install_chromedriver, setup_webdriver
+from .telemetry import forget_browser, metrics, record_browser_usage, span
+
+logger = logging.getLogger(__name__)
+
+
+def _total_memory_mb():
+    """Return the memory available to this process in MB, honouring cgroup limits"""
+    limits = []
+    try:
+        limits.append(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"))
+    except (ValueError, OSError, AttributeError):
+        pass
+    # Dentro de Docker el límite real viene del cgroup, no de la RAM del host
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit():
+                limits.append(int(value))
+        except OSError:
+            continue
+    if not limits:
+        return None
+    return min(limits) // (1024 * 1024)
+
+
+def default_worker_count():
+    """Pick a worker count from the available CPUs and RAM"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    workers = min(cpus, MAX_CAPTURE_WORKERS)
+
+    memory_mb = _total_memory_mb()
+    if memory_mb:
+        # Reservamos la mitad de la memoria para Streamlit y el sistema
+        workers = min(workers, (memory_mb // 2) // CHROME_WORKER_MEMORY_MB)
+    return max(1, workers)
+
+
+def driver_alive(driver):
+    """Check whether a Chrome session still answers commands"""
+    if driver is None:
+        return False
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+
+def quit_driver(driver):
+    if driver is None:
+        return
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _browser_processes(driver):
+    root = psutil.Process(driver.service.process.pid)
+    return [root] + root.children(recursive=True)
+
+
+def browser_rss_mb(driver):
+    """Resident memory in MB of the chromedriver process and every Chrome it spawned"""
+    if psutil is None:
+        return None
+    try:
+        return sum(p.memory_info().rss for p in _browser_processes(driver)) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def browser_cpu_seconds(driver):
+    """User plus system CPU time of the chromedriver process and its live children"""
+    if psutil is None:
+        return None
+    try:
+        return sum(sum(p.cpu_times()[:2]) for p in _browser_processes(driver))
+    except Exception:
+        return None
+
+
+_browser_ids = itertools.count(1)
+
+
+class PooledBrowser:
+    """A driver plus the bookkeeping used to decide when to recycle it"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.id = f"chrome-{next(_browser_ids)}"
+        self.pages = 0
+        self.created_at = time.time()
+        self.baseline_rss_mb = browser_rss_mb(driver)
+
+    def rss_growth_mb(self, current=None):
+        if current is None:
+            current = browser_rss_mb(self.driver)
+        if self.baseline_rss_mb is None or current is None:
+            return None
+        return current - self.baseline_rss_mb
+
+
+class BrowserPool:
+    """Hand out pre-warmed Chrome drivers and recycle them.
+
+    The pool keeps at least min_size idle browsers warm and never runs
+    more than max_size. A browser is health-checked before it is handed
+    out and replaced after max_pages pages or once its memory has grown
+    by more than max_rss_growth_mb since it started.
+    """
+
+    def __init__(self, min_size=BROWSER_POOL_MIN_SIZE, max_size=BROWSER_POOL_MAX_SIZE,
+                 max_pages=BROWSER_MAX_PAGES, max_rss_growth_mb=BROWSER_MAX_RSS_GROWTH_MB):
+        self.max_size = max_size or default_worker_count()
+        self.min_size = min(min_size, self.max_size)
+        self.max_pages = max_pages
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def warm_up(self):
+        """Start browsers in the background until min_size are idle"""
+        threading.Thread(target=self._fill, name="browser-pool-warmup", daemon=True).start()
+
+    def _fill(self):
+        # La instalación de ChromeDriver se hace una sola vez, antes del primer arranque
+        install_chromedriver()
+        while True:
+            with self._condition:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            browser = self._start_browser()
+            with self._condition:
+                if browser is None:
+                    self._size -= 1
+                    self._condition.notify()
+                    return
+                self._idle.append(browser)
+                self._condition.notify()
+
+    def _start_browser(self):
+        driver = setup_webdriver()
+        if driver is None:
+            return None
+        return PooledBrowser(driver)
+
+    def acquire(self, timeout=BROWSER_ACQUIRE_TIMEOUT):
+        """Take a healthy browser from the pool, starting one if there is room"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    if self._closed:
+                        raise RuntimeError("Browser pool has been closed")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("No browser became available in time")
+                    self._condition.wait(remaining)
+                if self._closed:
+                    raise RuntimeError("Browser pool has been closed")
+                browser = self._idle.pop() if self._idle else None
+                if browser is None:
+                    self._size += 1
+
+            if browser is None:
+                browser = self._start_browser()
+                if browser is None:
+                    self._discard(None)
+                    raise RuntimeError("Could not start Chrome. Please check the installation of Chrome and ChromeDriver.")
+                return browser
+            if driver_alive(browser.driver):
+                return browser
+            logger.info("Discarding unresponsive browser from the pool")
+            self._discard(browser)
+
+    def release(self, browser, healthy=True):
+        """Return a browser after a page, recycling it if it is worn out"""
+        browser.pages += 1
+        rss_mb = None
+        if healthy:
+            rss_mb = browser_rss_mb(browser.driver)
+            record_browser_usage(browser.id, rss_mb=rss_mb, cpu_seconds=browser_cpu_seconds(browser.driver),
+                                 pages=browser.pages)
+        reason = None
+        if not healthy:
+            reason = "unhealthy"
+        elif browser.pages >= self.max_pages:
+            reason = f"served {browser.pages} pages"
+        else:
+            growth = browser.rss_growth_mb(rss_mb)
+            if growth is not None and growth > self.max_rss_growth_mb:
+                reason = f"memory grew by {growth:.0f} MB"
+
+        if reason is None:
+            reason = self._reset(browser)
+        if reason is not None:
+            logger.info("Recycling browser: %s", reason)
+            self._discard(browser)
+            self.warm_up()
+            return
+
+        with self._condition:
+            if self._closed:
+                quit_driver(browser.driver)
+                self._size -= 1
+            else:
+                self._idle.append(browser)
+            self._condition.notify()
+        self._publish_size()
+
+    def _reset(self, browser):
+        """Leave the browser blank so no state leaks between jobs and sessions"""
+        try:
+            browser.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            browser.driver.get("about:blank")
+            return None
+        except Exception as e:
+            return f"reset failed: {e}"
+
+    def _discard(self, browser):
+        if browser is not None:
+            quit_driver(browser.driver)
+            forget_browser(browser.id)
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._publish_size()
+
+    def _publish_size(self):
+        with self._condition:
+            size, idle = self._size, len(self._idle)
+        metrics.set("bender_browser_pool_size", size, help_text="Browsers started by the pool")
+        metrics.set("bender_browser_pool_idle", idle, help_text="Warm browsers waiting for a page")
+
+    @contextmanager
+    def browser(self):
+        """Borrow a driver for the duration of a with block"""
+        with span("acquire") as attributes:
+            pooled = self.acquire()
+            attributes["browser"] = pooled.id
+        self._publish_size()
+        healthy = True
+        try:
+            yield pooled.driver
+        except BaseException:
+            healthy = driver_alive(pooled.driver)
+            raise
+        finally:
+            self.release(pooled, healthy=healthy)
+
+    def close(self):
+        """Quit every idle browser; busy ones are closed when released"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for browser in idle:
+            quit_driver(browser.driver)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Return the process-wide BrowserPool, warming it up on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            _pool.warm_up()
+        return _pool
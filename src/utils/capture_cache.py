@@ -0,0 +1,178 @@
+"""Content-addressed on-disk cache of captures with TTL and LRU eviction"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+
+from ..config.constants import CAPTURE_CACHE_DIR, CAPTURE_CACHE_TTL, CAPTURE_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    metadata TEXT,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_by_access ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_by_digest ON entries (digest);
+"""
+
+# Opciones que no cambian la captura y por tanto no forman parte de la clave.
+# La caché guarda el PNG original: el formato de salida se aplica después.
+_KEY_IGNORED_OPTIONS = (
+    "cache_mode", "priority", "output_format", "output_quality", "max_dimension", "png_optimize", "incremental",
+)
+
+
+def cache_key(url, resolution_name, width, height, options):
+    """Key a capture by URL, viewport, readiness policy and capture options"""
+    relevant = {k: v for k, v in asdict(options).items() if k not in _KEY_IGNORED_OPTIONS}
+    payload = json.dumps(
+        {"url": url, "resolution": resolution_name, "width": width, "height": height, "options": relevant},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CaptureCache:
+    """Store capture images on disk by content hash, indexed by capture key.
+
+    Entries expire after ttl seconds. When the blobs on disk exceed
+    max_bytes the least recently used entries are evicted; a blob file is
+    deleted once no entry points at it.
+    """
+
+    def __init__(self, root=CAPTURE_CACHE_DIR, ttl=CAPTURE_CACHE_TTL, max_bytes=CAPTURE_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def get(self, key):
+        """Return (image_bytes, metadata) for a fresh entry, or None"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row["created_at"] > self.ttl:
+                self._delete_entries(conn, [row])
+                row = None
+            if row is not None:
+                try:
+                    with open(self._blob_path(row["digest"]), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    # El blob desapareció del disco: tratar como fallo de caché
+                    self._delete_entries(conn, [row])
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return data, json.loads(row["metadata"] or "{}")
+
+    def put(self, key, data, metadata=None):
+        """Store image bytes under key and evict old entries if over the size cap"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            previous = conn.execute("SELECT * FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, digest, size, metadata, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, digest, len(data), json.dumps(metadata or {}), now, now),
+            )
+            if previous is not None and previous["digest"] != digest:
+                self._remove_orphan_blob(conn, previous["digest"])
+            self._evict(conn)
+
+    def _delete_entries(self, conn, rows):
+        for row in rows:
+            conn.execute("DELETE FROM entries WHERE key = ?", (row["key"],))
+            self._remove_orphan_blob(conn, row["digest"])
+
+    def _remove_orphan_blob(self, conn, digest):
+        in_use = conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        if in_use is None:
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+
+    def _total_bytes(self, conn):
+        row = conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM entries GROUP BY digest)").fetchone()
+        return row[0]
+
+    def _evict(self, conn):
+        expired = conn.execute("SELECT * FROM entries WHERE created_at < ?", (time.time() - self.ttl,)).fetchall()
+        self._delete_entries(conn, expired)
+        self.evictions += len(expired)
+
+        while self._total_bytes(conn) > self.max_bytes:
+            oldest = conn.execute("SELECT * FROM entries ORDER BY accessed_at LIMIT 50").fetchall()
+            if not oldest:
+                break
+            for row in oldest:
+                self._delete_entries(conn, [row])
+                self.evictions += 1
+                if self._total_bytes(conn) <= self.max_bytes:
+                    break
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current size of the cache"""
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total_bytes(conn)
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_capture_cache():
+    """Return the process-wide CaptureCache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CaptureCache()
+        return _cache
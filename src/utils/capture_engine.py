@@ -0,0 +1,407 @@
+"""Parallel capture engine backed by a pool of headless Chrome workers"""
+import logging
+import queue
+from collections import Counter
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ..config.constants import JOB_PRIORITIES, RETRY_MAX_ATTEMPTS, CHANGE_REUSE_MAX_AGE
+from .browser_pool import get_browser_pool
+from .capture_cache import cache_key, get_capture_cache
+from .change_detection import UNCHANGED_CHECKS, check_page, get_change_store
+from .failures import CircuitBreaker, CircuitOpenError, backoff_delay, failure_record
+from .scheduler import HostScheduler, task_host
+from .screenshot import CaptureOptions, capture_resolutions
+from .telemetry import current_trace_attributes, metrics, span, trace_context
+
+logger = logging.getLogger(__name__)
+
+# Tiempo máximo esperando un resultado antes de revisar que los workers sigan vivos
+_RESULT_POLL_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class CaptureTask:
+    """A single URL x resolution capture"""
+    url: str
+    resolution_name: str
+    width: int
+    height: int
+
+
+@dataclass
+class CaptureResult:
+    """Outcome of a CaptureTask"""
+    task: CaptureTask
+    screenshot: Optional[bytes] = None
+    error: Optional[str] = None
+    worker: Optional[str] = None
+    duration: float = 0.0
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def ok(self):
+        return self.screenshot is not None
+
+
+class _PageCheck:
+    """Change check of one URL, shared by all its page groups in a map() call.
+
+    Without multi_viewport every resolution is a separate group; they must
+    all see the same check result, and the new validators may only be
+    stored once every group has been served, or the groups running later
+    would compare against this run's page and reuse last run's images.
+    """
+
+    def __init__(self, url, groups):
+        self.url = url
+        self._remaining = groups
+        self._ok = True
+        self._checked = False
+        self.check = None
+        self.validators = None
+        self._lock = threading.Lock()
+
+    def run(self, changes):
+        """Return (check, validators), making the conditional GET only once"""
+        with self._lock:
+            if not self._checked:
+                with span("change_check") as attributes:
+                    self.check, self.validators = check_page(self.url, changes.page(self.url))
+                    attributes["result"] = self.check or "unavailable"
+                self._checked = True
+            return self.check, self.validators
+
+    def finish(self, ok):
+        """Record a finished group; True when it was the last and every group succeeded"""
+        with self._lock:
+            self._ok = self._ok and ok
+            self._remaining -= 1
+            return not self._remaining and self._ok and self.validators is not None
+
+
+class CaptureEngine:
+    """Spread capture tasks across N worker threads driving pooled Chromes.
+
+    Each worker borrows a warm browser from the BrowserPool for every page.
+    Pages are handed out by a HostScheduler: higher-priority jobs first,
+    hosts interleaved round-robin and at most MAX_TASKS_PER_HOST pages of
+    the same host in flight, whichever job they belong to.
+    Captures already in the CaptureCache are served without a browser,
+    according to options.cache_mode. With options.incremental, pages that
+    have not changed since the previous run reuse its images (see
+    change_detection); results carry metadata["change"].
+    Results are yielded in order of completion. A task that fails, or a
+    browser that crashes, only affects that task: the pool discards the
+    broken driver and hands out a healthy one for the next page.
+    Retryable failures (timeouts, network errors, crashed browsers) are
+    retried up to max_attempts times with backoff; hosts that keep failing
+    are skipped by a CircuitBreaker. Failed results carry a structured
+    record in metadata["failure"].
+    """
+
+    def __init__(self, workers=None, pool=None, cache=None, scheduler=None, breaker=None,
+                 max_attempts=RETRY_MAX_ATTEMPTS, changes=None, consent_memory=None):
+        self.pool = pool or get_browser_pool()
+        self.cache = cache or get_capture_cache()
+        self._changes = changes
+        # None: la ConsentMemory compartida del proceso
+        self.consent_memory = consent_memory
+        self.workers = workers or self.pool.max_size
+        self.scheduler = scheduler or HostScheduler()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started = 0
+        self._closed = False
+
+    @property
+    def changes(self):
+        # Solo se crea si algún job usa el modo incremental
+        if self._changes is None:
+            self._changes = get_change_store()
+        return self._changes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _ensure_workers(self):
+        """Start workers up to the configured count, replacing any that died"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Capture engine has been shut down")
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                self._started += 1
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"capture-worker-{self._started}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def map(self, tasks, options=None):
+        """Queue the tasks and return an iterator of CaptureResults in order of completion.
+
+        The tasks are queued right away, not on the first next(). With
+        options.multi_viewport, tasks for the same URL are handed to a
+        single worker so the page is loaded once for all its resolutions.
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return iter(())
+        options = options or CaptureOptions()
+        self._ensure_workers()
+
+        results = queue.Queue()
+        priority = JOB_PRIORITIES[options.priority]["rank"]
+        # Los spans de los workers heredan el contexto de quien llama (p. ej. el id del job)
+        context = current_trace_attributes()
+        groups = _group_tasks(tasks, options.multi_viewport)
+        checks = {}
+        if options.incremental:
+            counts = Counter(page_tasks[0].url for page_tasks in groups)
+            checks = {url: _PageCheck(url, count) for url, count in counts.items()}
+        for page_tasks in groups:
+            item = (page_tasks, options, results, context, checks.get(page_tasks[0].url))
+            self.scheduler.put(item, task_host(page_tasks[0].url), priority)
+        return self._iter_results(results, len(tasks))
+
+    def _iter_results(self, results, pending):
+        while pending:
+            try:
+                result = results.get(timeout=_RESULT_POLL_SECONDS)
+            except queue.Empty:
+                self._ensure_workers()
+                continue
+            pending -= 1
+            outcome = "ok" if result.ok else result.metadata.get("failure", {}).get("class", "error")
+            metrics.inc("bender_captures_total", help_text="Finished captures by outcome",
+                        outcome=outcome, cache=result.metadata.get("cache", "none"),
+                        change=result.metadata.get("change", {}).get("status", "none"))
+            yield result
+
+    def shutdown(self, cancel=False):
+        """Stop the workers once the queued pages are done; their browsers stay in the pool.
+
+        With cancel=True the pages not started yet are dropped and only the
+        ones being captured are waited for.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        self.scheduler.close(discard=cancel)
+        for thread in threads:
+            thread.join()
+
+    def _worker_loop(self):
+        name = threading.current_thread().name
+        while True:
+            item, host = self.scheduler.get()
+            if item is None:
+                return
+            page_tasks, options, results, context, page_check = item
+            try:
+                with trace_context(**context, url=page_tasks[0].url, host=host, worker=name):
+                    self._capture_page(page_tasks, options, results, host, name, page_check)
+            finally:
+                self.scheduler.done(host)
+
+    def _capture_page(self, page_tasks, options, results, host, worker, page_check=None):
+        """Capture one page at all its resolutions, retrying retryable failures.
+
+        page_check is the URL's shared _PageCheck when options.incremental.
+        """
+        start_time = time.time()
+        pending = list(page_tasks)
+        failure = None
+        attempt = 0
+        try:
+            keys = self._serve_from_cache(pending, options, results, worker)
+            previous = {}
+            if page_check is not None and pending:
+                previous = self._serve_unchanged(pending, options, results, worker, start_time, page_check)
+            while pending:
+                attempt += 1
+                try:
+                    if not self.breaker.allow(host):
+                        raise CircuitOpenError(f"{host} keeps failing; skipped until it recovers")
+                    rendered = []
+                    try:
+                        with self.pool.browser() as driver:
+                            resolutions = [(task.resolution_name, task.width, task.height) for task in pending]
+                            for resolution_name, screenshot, metadata in capture_resolutions(
+                                driver, page_tasks[0].url, resolutions, options, self.consent_memory
+                            ):
+                                task = _pop_task(pending, resolution_name)
+                                metadata["cache"] = "bypass" if options.cache_mode == "bypass" else "miss"
+                                metadata["attempts"] = attempt
+                                if task in keys:
+                                    with span("storage", target="cache", resolution=resolution_name):
+                                        self._store_in_cache(keys.pop(task), screenshot, metadata)
+                                if task in previous:
+                                    rendered.append((task, screenshot, metadata))
+                                    continue
+                                results.put(CaptureResult(
+                                    task=task,
+                                    screenshot=screenshot,
+                                    worker=worker,
+                                    duration=time.time() - start_time,
+                                    metadata=metadata,
+                                ))
+                    finally:
+                        # Comparar con el navegador ya devuelto: decodificar la captura
+                        # completa no debe tener ocupado un Chrome del pool
+                        for task, screenshot, metadata in rendered:
+                            screenshot, change = self._compare_with_previous(
+                                task, options, screenshot, previous[task], metadata,
+                            )
+                            results.put(CaptureResult(
+                                task=task,
+                                screenshot=screenshot,
+                                worker=worker,
+                                duration=time.time() - start_time,
+                                metadata={**metadata, "change": change},
+                            ))
+                    self.breaker.record_success(host)
+                except Exception as e:
+                    failure = failure_record(e, host, attempt)
+                    if failure["class"] != "circuit_open":
+                        self.breaker.record_failure(host, failure["class"])
+                    if not failure["retryable"] or attempt >= self.max_attempts or self._closed:
+                        raise
+                    delay = backoff_delay(attempt)
+                    logger.info("%s retrying %s in %.1fs after %s failure: %s",
+                                worker, page_tasks[0].url, delay, failure["class"], failure["message"])
+                    # El hueco del host sigue ocupado durante la espera: no se le envía más trabajo
+                    time.sleep(delay)
+        except Exception as e:
+            logger.warning("%s failed to capture %s: %s", worker, page_tasks[0].url, e)
+            if failure is None:
+                failure = failure_record(e, host, attempt)
+        finally:
+            # Siempre publicamos un resultado por tarea para no bloquear a quien consume map()
+            for task in pending:
+                results.put(CaptureResult(
+                    task=task,
+                    error=failure["message"] if failure else "Worker stopped before finishing the capture",
+                    worker=worker,
+                    duration=time.time() - start_time,
+                    metadata={"failure": failure} if failure else {},
+                ))
+            if page_check is not None and page_check.finish(ok=not pending):
+                self._save_page(page_check)
+
+    def _serve_from_cache(self, pending, options, results, worker):
+        """Publish cached captures and drop them from pending.
+
+        Returns the cache key of every task whose capture should be stored.
+        """
+        if options.cache_mode == "bypass":
+            return {}
+        keys = {}
+        for task in list(pending):
+            key = cache_key(task.url, task.resolution_name, task.width, task.height, options)
+            cached = self.cache.get(key) if options.cache_mode == "use" else None
+            if cached is None:
+                keys[task] = key
+                continue
+            screenshot, metadata = cached
+            pending.remove(task)
+            results.put(CaptureResult(
+                task=task,
+                screenshot=screenshot,
+                worker=worker,
+                metadata={**metadata, "cache": "hit"},
+            ))
+        return keys
+
+    def _serve_unchanged(self, pending, options, results, worker, start_time, page_check):
+        """Publish the previous run's images if the page has not changed, and drop them from pending.
+
+        Returns the previous capture of every task still pending (or None
+        for tasks never captured), to compare with once it is rendered.
+        Images rendered more than CHANGE_REUSE_MAX_AGE ago are not reused:
+        the HTML check cannot see content loaded by scripts, so such pages
+        are rendered and compared again.
+        """
+        previous = {
+            task: self.changes.capture(cache_key(task.url, task.resolution_name, task.width, task.height, options))
+            for task in pending
+        }
+        check, _ = page_check.run(self.changes)
+        if check not in UNCHANGED_CHECKS or not all(previous.values()):
+            return previous
+        if any(time.time() - capture["captured_at"] > CHANGE_REUSE_MAX_AGE for capture in previous.values()):
+            return previous
+
+        images = {task: self.changes.read(capture) for task, capture in previous.items()}
+        if not all(image is not None for image in images.values()):
+            return previous
+        for task in list(pending):
+            capture = previous[task]
+            pending.remove(task)
+            results.put(CaptureResult(
+                task=task,
+                screenshot=images[task],
+                worker=worker,
+                duration=time.time() - start_time,
+                metadata={
+                    **capture["metadata"],
+                    "cache": "none",
+                    "change": {"status": "unchanged", "check": check, "previous_capture": capture["captured_at"]},
+                },
+            ))
+        return {}
+
+    def _save_page(self, page_check):
+        try:
+            self.changes.save_page(page_check.url, page_check.validators)
+        except Exception as e:
+            # Sin validadores guardados la próxima ejecución simplemente renderiza
+            logger.warning("Could not store change validators of %s: %s", page_check.url, e)
+
+    def _compare_with_previous(self, task, options, screenshot, previous, metadata):
+        key = cache_key(task.url, task.resolution_name, task.width, task.height, options)
+        try:
+            with span("change_compare", resolution=task.resolution_name) as attributes:
+                screenshot, change = self.changes.compare(key, task.url, screenshot, previous, metadata)
+                attributes["result"] = change["status"]
+            return screenshot, change
+        except Exception as e:
+            # Si la comparación falla la captura nueva sigue siendo válida
+            logger.warning("Could not compare %s with its previous capture: %s", task.url, e)
+            return screenshot, {"status": "unknown"}
+
+    def _store_in_cache(self, key, screenshot, metadata):
+        try:
+            self.cache.put(key, screenshot, metadata)
+        except Exception as e:
+            # Un fallo de la caché no debe perder la captura
+            logger.warning("Could not store capture in cache: %s", e)
+
+
+def _pop_task(tasks, resolution_name):
+    for index, task in enumerate(tasks):
+        if task.resolution_name == resolution_name:
+            return tasks.pop(index)
+    raise KeyError(resolution_name)
+
+
+def _group_tasks(tasks, multi_viewport):
+    """Split tasks into per-page batches: one per URL, or one per task"""
+    if not multi_viewport:
+        return [[task] for task in tasks]
+    pages = {}
+    for task in tasks:
+        pages.setdefault(task.url, []).append(task)
+    return list(pages.values())
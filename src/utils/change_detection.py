@@ -0,0 +1,269 @@
+"""Change detection between capture runs, for incremental captures.
+
+For every page the ChangeStore keeps the HTTP validators (ETag,
+Last-Modified) and a hash of the HTML from the last run, and for every
+URL x resolution the last image and its perceptual hash. Before
+rendering, check_page() makes a conditional GET: a 304 or identical HTML
+means the previous images can be reused without a browser. After
+rendering, an image whose perceptual hash is within PHASH_MAX_DISTANCE
+bits and PHASH_MAX_COLOR_DELTA colour levels of the previous one is
+treated as unchanged, and the previous image is kept so repeated runs
+produce byte-identical files.
+
+The HTML check only sees the document itself: a page whose HTML is
+unchanged but whose images or styles changed is reported as unchanged.
+The engine therefore only reuses images rendered within
+CHANGE_REUSE_MAX_AGE; older ones are rendered and compared again.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from io import BytesIO
+
+from PIL import Image
+
+from ..config.constants import (
+    CHANGE_STORE_DIR, CHANGE_STORE_TTL, CHANGE_CHECK_TIMEOUT, CHANGE_CHECK_MAX_MB, PHASH_SIZE, PHASH_MAX_DISTANCE,
+    PHASH_MAX_COLOR_DELTA, DESKTOP_USER_AGENT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Resultados de check_page que permiten reutilizar las capturas anteriores
+UNCHANGED_CHECKS = ("not_modified", "same_html")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    html_hash TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS captures (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    phash TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    metadata TEXT,
+    captured_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captures_by_digest ON captures (digest);
+"""
+
+
+def perceptual_hash(data):
+    """Perceptual signature of an image and its size.
+
+    The signature is a difference hash (layout and edges) followed by the
+    mean colours of an 8x8 grid, which the difference hash cannot see.
+    """
+    with Image.open(BytesIO(data)) as image:
+        size = image.size
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGBA")
+        # El hash solo mira unos pocos píxeles: reducir antes de convertir evita
+        # una copia RGB a tamaño completo de la página entera
+        rgb = image.reduce(max(1, min(size) // (PHASH_SIZE * 4))).convert("RGB")
+    small = rgb.convert("L").resize((PHASH_SIZE + 1, PHASH_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(PHASH_SIZE):
+        for col in range(PHASH_SIZE):
+            left = pixels[row * (PHASH_SIZE + 1) + col]
+            bits = (bits << 1) | (left > pixels[row * (PHASH_SIZE + 1) + col + 1])
+    colors = rgb.resize((8, 8), Image.Resampling.BOX, reducing_gap=2.0).tobytes()
+    return f"{bits:0{PHASH_SIZE * PHASH_SIZE // 4}x}:{colors.hex()}", size
+
+
+def hash_distance(a, b):
+    """(differing bits of the difference hashes, largest colour difference) of two signatures"""
+    a_bits, _, a_colors = a.partition(":")
+    b_bits, _, b_colors = b.partition(":")
+    bits = bin(int(a_bits, 16) ^ int(b_bits, 16)).count("1")
+    colors = max((abs(x - y) for x, y in zip(bytes.fromhex(a_colors), bytes.fromhex(b_colors))), default=0)
+    return bits, colors
+
+
+def check_page(url, page=None):
+    """Conditional GET of url against the validators stored for it.
+
+    Returns (result, validators). result is "not_modified" (HTTP 304),
+    "same_html", "changed", or None when the page could not be fetched;
+    validators are the etag, last_modified and html_hash to store.
+    """
+    headers = {"User-Agent": DESKTOP_USER_AGENT, "Accept": "text/html,*/*;q=0.8"}
+    if page and page.get("etag"):
+        headers["If-None-Match"] = page["etag"]
+    if page and page.get("last_modified"):
+        headers["If-Modified-Since"] = page["last_modified"]
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=CHANGE_CHECK_TIMEOUT) as response:
+            body = response.read(CHANGE_CHECK_MAX_MB * 1024 * 1024 + 1)
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "html_hash": None,
+            }
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and page:
+            return "not_modified", {
+                "etag": e.headers.get("ETag") or page.get("etag"),
+                "last_modified": e.headers.get("Last-Modified") or page.get("last_modified"),
+                "html_hash": page.get("html_hash"),
+            }
+        logger.debug("Change check of %s returned HTTP %s", url, e.code)
+        return None, None
+    except (OSError, ValueError) as e:
+        # Sin comprobación previa la página simplemente se renderiza
+        logger.debug("Change check of %s failed: %s", url, e)
+        return None, None
+
+    if len(body) > CHANGE_CHECK_MAX_MB * 1024 * 1024:
+        return "changed", validators
+    validators["html_hash"] = hashlib.sha256(body).hexdigest()
+    if page and page.get("html_hash") == validators["html_hash"]:
+        return "same_html", validators
+    return "changed", validators
+
+
+class ChangeStore:
+    """Last run's page validators and images, in SQLite plus content-addressed files.
+
+    Captures older than ttl are forgotten, so pages not seen for a while
+    are rendered and compared from scratch.
+    """
+
+    def __init__(self, root=CHANGE_STORE_DIR, ttl=CHANGE_STORE_TTL):
+        self.root = root
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        self.prune()
+
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def page(self, url):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def save_page(self, url, validators):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, html_hash, checked_at) VALUES (?, ?, ?, ?, ?)",
+                (url, validators.get("etag"), validators.get("last_modified"), validators.get("html_hash"), time.time()),
+            )
+
+    def capture(self, key):
+        """The previous capture stored under key, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM captures WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row["captured_at"] > self.ttl:
+            return None
+        capture = dict(row)
+        capture["metadata"] = json.loads(capture["metadata"] or "{}")
+        return capture
+
+    def touch_capture(self, key):
+        """Mark the capture under key as confirmed by a fresh render, so it does not expire"""
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE captures SET captured_at = ? WHERE key = ?", (time.time(), key))
+
+    def read(self, capture):
+        """Image bytes of a stored capture, or None if the file is gone"""
+        try:
+            with open(self._blob_path(capture["digest"]), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save_capture(self, key, url, data, phash, size, metadata=None):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock, self._connect() as conn:
+            previous = conn.execute("SELECT digest FROM captures WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO captures (key, url, digest, phash, width, height, metadata, captured_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, digest, phash, size[0], size[1], json.dumps(metadata or {}), time.time()),
+            )
+            if previous is not None and previous["digest"] != digest:
+                self._remove_orphan_blob(conn, previous["digest"])
+
+    def _remove_orphan_blob(self, conn, digest):
+        if conn.execute("SELECT 1 FROM captures WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+
+    def prune(self):
+        """Forget captures and pages older than ttl and delete their images"""
+        cutoff = time.time() - self.ttl
+        with self._lock, self._connect() as conn:
+            digests = [row["digest"] for row in conn.execute(
+                "SELECT DISTINCT digest FROM captures WHERE captured_at < ?", (cutoff,)
+            )]
+            conn.execute("DELETE FROM captures WHERE captured_at < ?", (cutoff,))
+            conn.execute("DELETE FROM pages WHERE checked_at < ?", (cutoff,))
+            for digest in digests:
+                self._remove_orphan_blob(conn, digest)
+        return len(digests)
+
+    def compare(self, key, url, data, previous, metadata=None):
+        """Compare a fresh capture with the previous one and return (image, change).
+
+        Visually identical captures keep the previous image; anything else
+        replaces it in the store. change is the "change" entry of the
+        capture metadata.
+        """
+        phash, size = perceptual_hash(data)
+        if previous is not None and (previous["width"], previous["height"]) == size:
+            distance, color_delta = hash_distance(phash, previous["phash"])
+            if distance <= PHASH_MAX_DISTANCE and color_delta <= PHASH_MAX_COLOR_DELTA:
+                previous_data = self.read(previous)
+                if previous_data is not None:
+                    self.touch_capture(key)
+                    return previous_data, {
+                        "status": "unchanged", "check": "phash", "distance": distance,
+                        "previous_capture": previous["captured_at"],
+                    }
+        self.save_capture(key, url, data, phash, size, metadata)
+        return data, {"status": "changed" if previous is not None else "new"}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_change_store():
+    """Return the process-wide ChangeStore"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChangeStore()
+        return _store
@@ -0,0 +1,281 @@
+"""Cookie-consent banner dismissal in a single script call, with per-domain memory.
+
+CONSENT_SCRIPT looks for the "accept" button of the common consent
+management platforms (OneTrust, Cookiebot, Didomi, Quantcast, TrustArc,
+Usercentrics...) and, failing that, for a short button whose text is an
+"accept" phrase in one of CONSENT_ACCEPT_PHRASES' languages. It searches
+the page, open shadow roots and same-origin iframes in one pass, clicks
+the first match and waits at most CONSENT_SETTLE_MS for the banner to go
+away. Cross-origin consent iframes (Sourcepoint, Funding Choices...) are
+entered from Selenium and searched with the same script.
+
+ConsentMemory remembers per domain the selector that dismissed its
+banner, so later captures try that selector first. Only selectors that
+worked are remembered: a page without a banner says nothing about the
+other pages of its domain, so the search always runs.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from ..config.constants import CONSENT_MEMORY_PATH, CONSENT_MEMORY_TTL, CONSENT_SETTLE_MS, CONSENT_ACCEPT_PHRASES
+
+logger = logging.getLogger(__name__)
+
+_SAVE_INTERVAL = 3600  # segundos entre escrituras si ningún dominio cambia
+
+# Botón "aceptar" de cada CMP conocida, en orden de popularidad
+CMP_SELECTORS = [
+    ("onetrust", "#onetrust-accept-btn-handler"),
+    ("cookiebot", "#CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll"),
+    ("cookiebot", "#CybotCookiebotDialogBodyButtonAccept"),
+    ("didomi", "#didomi-notice-agree-button"),
+    ("quantcast", ".qc-cmp2-summary-buttons button[mode='primary']"),
+    ("trustarc", "#truste-consent-button"),
+    ("usercentrics", "[data-testid='uc-accept-all-button']"),
+    ("cookieyes", ".cky-btn-accept"),
+    ("complianz", ".cmplz-btn.cmplz-accept"),
+    ("osano", ".osano-cm-accept-all"),
+    ("iubenda", ".iubenda-cs-accept-btn"),
+    ("klaro", ".cm-btn-accept-all"),
+    ("borlabs", "a[data-cookie-accept-all]"),
+    ("termly", "[data-tid='banner-accept']"),
+    ("funding-choices", ".fc-cta-consent"),
+    ("cookieconsent", ".cc-allow"),
+    ("cookieconsent", ".cc-btn.cc-dismiss"),
+    ("sourcepoint", "button.sp_choice_type_11"),
+    ("axeptio", "#axeptio_btn_acceptAll"),
+    ("tarteaucitron", "#tarteaucitronPersonalize2"),
+]
+
+# Iframes de consentimiento de otro origen: hay que entrar en ellos desde Selenium
+CONSENT_FRAME_HINTS = (
+    "sp_message_iframe", "privacy-mgmt.com", "consent", "cmp", "cookielaw", "consensu.org",
+    "trustarc", "fundingchoicesmessages", "didomi", "usercentrics",
+)
+
+CONSENT_SCRIPT = r"""
+var known = arguments[0], cmpSelectors = arguments[1], phrases = arguments[2], settleMs = arguments[3];
+var done = arguments[arguments.length - 1];
+
+function visible(el) {
+  if (!el || !el.getClientRects().length) return false;
+  var style = el.ownerDocument.defaultView.getComputedStyle(el);
+  return style.visibility !== "hidden" && style.display !== "none" && style.opacity !== "0";
+}
+function normalize(text) {
+  return (text || "").replace(/[\u2018\u2019`]/g, "'").replace(/\s+/g, " ").trim().toLowerCase();
+}
+function roots(doc) {
+  // Documento, shadow roots abiertos e iframes del mismo origen
+  var found = [{root: doc, frame: "top"}], queue = [doc];
+  while (queue.length) {
+    var root = queue.shift(), all = root.querySelectorAll("*");
+    for (var i = 0; i < all.length; i++) {
+      var el = all[i];
+      if (el.shadowRoot) { found.push({root: el.shadowRoot, frame: "shadow"}); queue.push(el.shadowRoot); }
+      if (el.tagName === "IFRAME") {
+        try {
+          var inner = el.contentDocument;
+          if (inner && inner.documentElement) { found.push({root: inner, frame: "iframe"}); queue.push(inner); }
+        } catch (e) { /* otro origen */ }
+      }
+    }
+  }
+  return found;
+}
+function bySelector(searchRoots, selector) {
+  for (var i = 0; i < searchRoots.length; i++) {
+    var el;
+    try { el = searchRoots[i].root.querySelector(selector); } catch (e) { return null; }
+    if (visible(el)) return {el: el, frame: searchRoots[i].frame};
+  }
+  return null;
+}
+function navigates(el) {
+  // Enlaces con href real: hacer clic saldría de la página en vez de cerrar el banner
+  if (el.tagName !== "A") return false;
+  var href = (el.getAttribute("href") || "").trim().toLowerCase();
+  return href !== "" && href.charAt(0) !== "#" && href.indexOf("javascript:") !== 0;
+}
+function byText(searchRoots) {
+  var candidates = "button, a, [role='button'], input[type='button'], input[type='submit']";
+  for (var i = 0; i < searchRoots.length; i++) {
+    var els = searchRoots[i].root.querySelectorAll(candidates);
+    for (var j = 0; j < els.length; j++) {
+      var el = els[j], text = normalize(el.innerText || el.value || el.getAttribute("aria-label"));
+      if (!text || text.length > 40 || navigates(el) || !visible(el)) continue;
+      for (var k = 0; k < phrases.length; k++) {
+        if (text === phrases[k] || text.indexOf(phrases[k] + " ") === 0) return {el: el, frame: searchRoots[i].frame, text: text};
+      }
+    }
+  }
+  return null;
+}
+
+var searchRoots = roots(document), match = null, cmp = null, selector = null, strategy = null;
+if (known) {
+  match = bySelector(searchRoots, known);
+  if (match) { selector = known; strategy = "memory"; }
+}
+for (var i = 0; !match && i < cmpSelectors.length; i++) {
+  match = bySelector(searchRoots, cmpSelectors[i][1]);
+  if (match) { cmp = cmpSelectors[i][0]; selector = cmpSelectors[i][1]; strategy = "cmp"; }
+}
+if (!match) {
+  match = byText(searchRoots);
+  if (match) {
+    strategy = "text";
+    selector = match.el.id ? "#" + CSS.escape(match.el.id) : null;
+  }
+}
+if (!match) { done({clicked: false}); return; }
+
+var el = match.el;
+try { el.click(); } catch (e) { done({clicked: false, error: String(e)}); return; }
+var started = Date.now();
+(function settle() {
+  // El banner suele desaparecer (o quitarse del DOM) tras el clic; no esperar más de settleMs
+  if (!el.isConnected || !visible(el) || Date.now() - started > settleMs) {
+    done({clicked: true, cmp: cmp, selector: selector, frame: match.frame, strategy: strategy,
+          text: match.text || null, settled: !el.isConnected || !visible(el)});
+  } else {
+    setTimeout(settle, 50);
+  }
+})();
+"""
+
+
+def consent_domain(url):
+    """Key used by ConsentMemory: the host without a leading www."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class ConsentMemory:
+    """Per-domain selector that last dismissed a consent banner, persisted as JSON.
+
+    Each domain maps to {"selector": str, "checked_at": ts}. Entries older
+    than ttl are ignored so sites that change their banner are searched
+    again. With path=None the memory only lives in this object (e.g. for
+    benchmarks that must not depend on earlier runs).
+    """
+
+    def __init__(self, path=CONSENT_MEMORY_PATH, ttl=CONSENT_MEMORY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        self._entries = self._load()
+
+    def _load(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Las versiones anteriores también guardaban dominios sin banner
+        return {domain: entry for domain, entry in entries.items() if entry.get("selector")}
+
+    def _save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+    def selector(self, domain):
+        """The selector remembered for domain, or None"""
+        with self._lock:
+            entry = self._entries.get(domain)
+        if entry is None or time.time() - entry.get("checked_at", 0) > self.ttl:
+            return None
+        return entry["selector"]
+
+    def remember(self, domain, selector):
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(domain)
+            self._entries[domain] = {"selector": selector, "checked_at": now}
+            # Mismo selector que antes: no reescribir el fichero en cada captura
+            if previous and previous["selector"] == selector and now - self._saved_at < _SAVE_INTERVAL:
+                return
+            self._saved_at = now
+            try:
+                self._save()
+            except OSError as e:
+                logger.debug("Could not persist consent memory: %s", e)
+
+
+def _run_script(driver, known_selector):
+    return driver.execute_async_script(
+        CONSENT_SCRIPT, known_selector, CMP_SELECTORS, CONSENT_ACCEPT_PHRASES, CONSENT_SETTLE_MS,
+    ) or {"clicked": False}
+
+
+def _search_consent_frames(driver):
+    """Run the script inside cross-origin consent iframes; returns the first click"""
+    try:
+        frames = driver.execute_script(
+            "return Array.prototype.map.call(document.querySelectorAll('iframe'),"
+            " function (f) { return (f.id || '') + ' ' + (f.name || '') + ' ' + (f.src || ''); });"
+        ) or []
+    except Exception:
+        return None
+    for index, description in enumerate(frames):
+        if not any(hint in description.lower() for hint in CONSENT_FRAME_HINTS):
+            continue
+        try:
+            driver.switch_to.frame(index)
+            result = _run_script(driver, None)
+        except Exception as e:
+            logger.debug("Could not search consent iframe %s: %s", description, e)
+            continue
+        finally:
+            driver.switch_to.default_content()
+        if result.get("clicked"):
+            result["frame"] = "cross-origin iframe"
+            return result
+    return None
+
+
+def dismiss_consent(driver, url, memory=None):
+    """Dismiss the page's cookie-consent banner, if any, and describe what happened.
+
+    memory defaults to the process-wide ConsentMemory. Returns a dict for
+    the capture metadata: clicked, source ("memory" if the remembered
+    selector worked, otherwise "search"), and the cmp, selector and frame
+    that worked.
+    """
+    if memory is None:
+        memory = get_consent_memory()
+    domain = consent_domain(url)
+    known_selector = memory.selector(domain)
+    result = _run_script(driver, known_selector)
+    if not result.get("clicked"):
+        result = _search_consent_frames(driver) or result
+
+    result["source"] = "memory" if result.get("strategy") == "memory" else "search"
+    if result.get("clicked") and result.get("selector"):
+        memory.remember(domain, result["selector"])
+    return result
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_consent_memory():
+    """Return the process-wide ConsentMemory"""
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = ConsentMemory()
+        return _memory
@@ -0,0 +1,132 @@
+"""Helpers for reading Chrome DevTools protocol events through Selenium"""
+import json
+import logging
+import time
+
+from ..config.constants import REQUEST_BLOCKING_PROFILES, BLOCKED_RESOURCE_TYPE_PATTERNS
+
+logger = logging.getLogger(__name__)
+
+# Capability que hace que ChromeDriver guarde los eventos de DevTools en el log "performance"
+PERFORMANCE_LOGGING_CAPABILITY = ("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def read_devtools_events(driver):
+    """Drain the performance log and return the DevTools messages it contains"""
+    events = []
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        events.append(message)
+    return events
+
+
+def blocked_url_patterns(profile_name):
+    """URL patterns blocked by a REQUEST_BLOCKING_PROFILES entry"""
+    profile = REQUEST_BLOCKING_PROFILES.get(profile_name)
+    if profile is None:
+        raise ValueError(f"Unknown request blocking profile: {profile_name!r}")
+    patterns = list(profile["url_patterns"])
+    for resource_type in profile["resource_types"]:
+        patterns.extend(BLOCKED_RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+    return patterns
+
+
+def apply_request_blocking(driver, profile_name):
+    """Block the profile's requests for every following navigation of driver.
+
+    Pass "none" to lift the block before the driver is reused.
+    """
+    patterns = blocked_url_patterns(profile_name)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+
+class NetworkMonitor:
+    """Track in-flight network requests of a page from DevTools Network events.
+
+    Events are read from ChromeDriver's performance log, so the driver must
+    be created with PERFORMANCE_LOGGING_CAPABILITY. When the log is not
+    available the monitor reports itself as unavailable instead of failing.
+
+    It also counts requests blocked through Network.setBlockedURLs and the
+    bytes actually transferred; see summary().
+    """
+
+    def __init__(self, driver, max_inflight=0):
+        self.driver = driver
+        self.max_inflight = max_inflight
+        self.available = True
+        self.inflight = set()
+        self.requests = 0
+        self.blocked = 0
+        self.blocked_by_type = {}
+        self.transferred_bytes = 0
+        self._types = {}
+        self.busy_at = time.monotonic()
+
+    def reset(self):
+        """Forget requests from previous pages and start counting from now"""
+        self.poll()
+        self.inflight.clear()
+        self.requests = 0
+        self.blocked = 0
+        self.blocked_by_type = {}
+        self.transferred_bytes = 0
+        self._types.clear()
+        self.busy_at = time.monotonic()
+
+    def poll(self):
+        """Consume pending DevTools events and update the request bookkeeping"""
+        if not self.available:
+            return []
+        try:
+            events = read_devtools_events(self.driver)
+        except Exception as e:
+            logger.debug("Performance log not available: %s", e)
+            self.available = False
+            return []
+
+        now = time.monotonic()
+        for event in events:
+            method = event.get("method")
+            params = event.get("params", {})
+            request_id = params.get("requestId")
+            before = len(self.inflight)
+            if method == "Network.requestWillBeSent":
+                if request_id not in self.inflight:
+                    self.requests += 1
+                self.inflight.add(request_id)
+                self._types[request_id] = params.get("type", "Other")
+            elif method == "Network.loadingFinished":
+                self.inflight.discard(request_id)
+                self.transferred_bytes += int(params.get("encodedDataLength") or 0)
+            elif method == "Network.loadingFailed":
+                self.inflight.discard(request_id)
+                # setBlockedURLs reporta blockedReason "inspector"
+                if params.get("blockedReason"):
+                    resource_type = params.get("type") or self._types.get(request_id, "Other")
+                    self.blocked += 1
+                    self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+            else:
+                continue
+            if before > self.max_inflight or len(self.inflight) > self.max_inflight:
+                self.busy_at = now
+        return events
+
+    def idle_for(self):
+        """Seconds the page has stayed at or below max_inflight open requests"""
+        if len(self.inflight) > self.max_inflight:
+            return 0.0
+        return time.monotonic() - self.busy_at
+
+    def summary(self):
+        """Request counters for the capture metadata"""
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "transferred_bytes": self.transferred_bytes,
+        }
@@ -0,0 +1,169 @@
+"""Re-encoding of captured screenshots into the job's output format.
+
+Captures are always taken as PNG. encode_results() hands every successful
+capture to the shared process pool, where encode_screenshot() converts it
+to WebP or JPEG, downscales it or re-optimizes the PNG, so the capture
+workers never wait for the encoder. encode_screenshot runs in worker
+processes, so this module must stay importable without Streamlit or
+Selenium.
+"""
+import contextvars
+import logging
+import queue
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from ..config.constants import OUTPUT_FORMATS, WEBP_MAX_DIMENSION, OUTPUT_FORMAT_FALLBACK
+from .process_pool import get_process_pool
+from .telemetry import record_span
+
+logger = logging.getLogger(__name__)
+
+
+def needs_encoding(options):
+    """False when the job keeps the PNG exactly as captured"""
+    return options.output_format != "png" or bool(options.max_dimension) or options.png_optimize
+
+
+def _info(output_format, data, original_bytes, size):
+    fmt = OUTPUT_FORMATS[output_format]
+    return {
+        "format": output_format,
+        "extension": fmt["extension"],
+        "media_type": fmt["media_type"],
+        "original_bytes": original_bytes,
+        "encoded_bytes": len(data),
+        "width": size[0],
+        "height": size[1],
+    }
+
+
+def passthrough_info(data):
+    """Encoding metadata of a PNG stored as captured"""
+    with Image.open(BytesIO(data)) as image:
+        size = image.size
+    return _info("png", data, len(data), size)
+
+
+def encode_screenshot(data, output_format, quality, max_dimension=0, optimize=False):
+    """Re-encode a PNG capture and return (bytes, info).
+
+    info records the format actually used, the original and encoded sizes
+    and the final dimensions. Images too large for WebP are written in the
+    format given by OUTPUT_FORMAT_FALLBACK.
+    """
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+    original_size = image.size
+    if max_dimension and max(image.size) > max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    requested = output_format
+    if OUTPUT_FORMATS[output_format]["pil_format"] == "WEBP" and max(image.size) > WEBP_MAX_DIMENSION:
+        output_format = OUTPUT_FORMAT_FALLBACK[output_format]
+    fmt = OUTPUT_FORMATS[output_format]
+
+    output = BytesIO()
+    if fmt["pil_format"] == "JPEG":
+        image.convert("RGB").save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt["pil_format"] == "WEBP":
+        # method 4 es el punto medio de velocidad/tamaño de libwebp
+        image.save(output, format="WEBP", lossless=fmt["lossless"], quality=quality, method=4)
+    else:
+        image.save(output, format="PNG", optimize=optimize)
+    encoded = output.getvalue()
+
+    if output_format == "png" and image.size == original_size and len(encoded) >= len(data):
+        # La recompresión no ganó nada: quedarse con el PNG de Chrome
+        encoded = data
+    info = _info(output_format, encoded, len(data), image.size)
+    if not fmt["lossless"]:
+        info["quality"] = quality
+    if image.size != original_size:
+        info["original_width"], info["original_height"] = original_size
+    if output_format != requested:
+        info["requested_format"] = requested
+    return encoded, info
+
+
+def _finish(result, future, submitted_at):
+    try:
+        data, info = future.result()
+        outcome = "ok"
+    except Exception as e:
+        # Mejor guardar el PNG original que perder la captura
+        logger.warning("Could not encode %s (%s), keeping the PNG: %s",
+                       result.task.url, result.task.resolution_name, e)
+        data, info = result.screenshot, {**passthrough_info(result.screenshot), "error": str(e)}
+        outcome = "error"
+    # Incluye la espera en la cola del pool de procesos
+    record_span("encode", time.perf_counter() - submitted_at, outcome=outcome, target="image",
+                url=result.task.url, resolution=result.task.resolution_name,
+                format=info["format"], bytes=info["encoded_bytes"])
+    return result, data, info
+
+
+def encode_results(results, options):
+    """Yield (result, data, info) for every CaptureResult, re-encoded as options ask.
+
+    Failed captures are yielded with data and info set to None. Encoded
+    captures are yielded as soon as their encoding finishes, even while
+    the next capture is still being taken, so they may come out in a
+    different order than results.
+    """
+    if not needs_encoding(options):
+        for result in results:
+            yield result, result.screenshot, passthrough_info(result.screenshot) if result.ok else None
+        return
+
+    pool = get_process_pool()
+    # Capturas nuevas y codificaciones terminadas llegan por la misma cola,
+    # así ninguna espera a la otra
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def feed():
+        try:
+            for result in results:
+                events.put(("result", result))
+                if stop.is_set():
+                    return
+        except Exception as e:
+            events.put(("error", e))
+            return
+        events.put(("end", None))
+
+    threading.Thread(
+        target=contextvars.copy_context().run, args=(feed,), name="encode-feeder", daemon=True,
+    ).start()
+    pending = 0
+    finished = False
+    try:
+        while not finished or pending:
+            kind, item = events.get()
+            if kind == "result":
+                if not item.ok:
+                    yield item, None, None
+                    continue
+                submitted_at = time.perf_counter()
+                future = pool.submit(
+                    encode_screenshot, item.screenshot, options.output_format, options.output_quality,
+                    options.max_dimension, options.png_optimize,
+                )
+                pending += 1
+                future.add_done_callback(
+                    lambda future, result=item, submitted_at=submitted_at:
+                    events.put(("encoded", (result, future, submitted_at)))
+                )
+            elif kind == "encoded":
+                pending -= 1
+                yield _finish(*item)
+            elif kind == "error":
+                raise item
+            else:
+                finished = True
+    finally:
+        stop.set()
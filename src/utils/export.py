@@ -0,0 +1,60 @@
+"""Incrementally built ZIP exports of captured screenshots"""
+import os
+import zipfile
+from datetime import datetime
+from urllib.parse import urlparse
+
+# Formatos ya comprimidos: recomprimirlos con DEFLATE solo gasta CPU
+STORED_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif"}
+
+
+class ZipExporter:
+    """Write captures into a ZIP archive on disk as they finish.
+
+    Entries are appended one at a time, so only the capture being added
+    is in memory. The archive is written to "<path>.part" and renamed to
+    path on close, so a finished archive is never half-written. File
+    names use one timestamp for the whole archive and stay unique.
+    """
+
+    def __init__(self, path, timestamp=None):
+        self.path = path
+        self.part_path = f"{path}.part"
+        self.timestamp = (timestamp or datetime.now()).strftime('%Y%m%d_%H%M%S')
+        self._names = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._zip = zipfile.ZipFile(self.part_path, "w", zipfile.ZIP_DEFLATED)
+
+    def _filename(self, url, resolution_name, extension):
+        # Obtener el dominio de la URL para usar en el nombre del archivo
+        domain = urlparse(url).netloc
+        device = resolution_name.split()[0].lower()
+        base = f"{domain}_{device}_{self.timestamp}"
+        filename = f"{base}.{extension}"
+        counter = 2
+        while filename in self._names:
+            filename = f"{base}_{counter}.{extension}"
+            counter += 1
+        self._names.add(filename)
+        return filename
+
+    def add(self, url, resolution_name, data, extension="png"):
+        """Append one capture and return its name inside the archive"""
+        filename = self._filename(url, resolution_name, extension)
+        compression = zipfile.ZIP_STORED if extension.lower() in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        self._zip.writestr(filename, data, compress_type=compression)
+        return filename
+
+    def close(self):
+        """Finish the archive and move it into place"""
+        self._zip.close()
+        os.replace(self.part_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Discard a partially written archive"""
+        self._zip.close()
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
@@ -0,0 +1,137 @@
+"""Failure classification, retry backoff and per-host circuit breaking for captures"""
+import random
+import threading
+import time
+
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException, WebDriverException
+
+from ..config.constants import (
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_COOLDOWN,
+)
+
+# Clases de fallo: (reintentable, atribuible al host)
+FAILURE_CLASSES = {
+    "timeout": (True, True),
+    "network": (True, True),
+    "dns": (False, True),
+    "tls": (False, True),
+    "browser_crash": (True, False),
+    "browser_unavailable": (False, False),
+    "circuit_open": (False, False),
+    "error": (False, False),
+}
+
+# Errores de red de Chrome que no se arreglan reintentando
+_NETWORK_PERMANENT = {
+    "net::ERR_NAME_NOT_RESOLVED": "dns",
+    "net::ERR_NAME_RESOLUTION_FAILED": "dns",
+    "net::ERR_CERT_": "tls",
+    "net::ERR_SSL_": "tls",
+}
+_CRASH_MARKERS = ("chrome not reachable", "tab crashed", "session deleted", "disconnected", "target window already closed")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of loading a page from a host whose circuit is open"""
+
+
+def classify_error(error):
+    """Return the FAILURE_CLASSES name for an exception raised by a capture"""
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, (TimeoutException, TimeoutError)):
+        # El TimeoutError del pool significa que no quedaban navegadores libres
+        return "browser_unavailable" if isinstance(error, TimeoutError) else "timeout"
+    message = str(error)
+    if isinstance(error, InvalidSessionIdException):
+        return "browser_crash"
+    if isinstance(error, WebDriverException):
+        if "net::ERR_" in message:
+            for marker, failure_class in _NETWORK_PERMANENT.items():
+                if marker in message:
+                    return failure_class
+            return "timeout" if "TIMED_OUT" in message else "network"
+        if any(marker in message.lower() for marker in _CRASH_MARKERS):
+            return "browser_crash"
+        if "timeout" in message.lower():
+            return "timeout"
+    if "Could not start Chrome" in message:
+        return "browser_unavailable"
+    return "error"
+
+
+def is_retryable(failure_class):
+    return FAILURE_CLASSES[failure_class][0]
+
+
+def failure_record(error, host, attempts):
+    """Structured description of a failed capture for the result metadata"""
+    failure_class = classify_error(error)
+    return {
+        "class": failure_class,
+        "retryable": is_retryable(failure_class),
+        "message": (str(error) or error.__class__.__name__).splitlines()[0][:500],
+        "host": host,
+        "attempts": attempts,
+    }
+
+
+def backoff_delay(attempt, base=RETRY_BACKOFF_BASE, maximum=RETRY_BACKOFF_MAX):
+    """Seconds to wait before retry number attempt (1-based), with full jitter"""
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Stop sending work to hosts that keep failing.
+
+    After threshold consecutive host-attributable failures the host's
+    circuit opens and allow() returns False for cooldown seconds. Then one
+    trial capture is let through (half-open): success closes the circuit,
+    another failure opens it again.
+    """
+
+    def __init__(self, threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = {}
+        self._opened_at = {}
+        self._trial = set()
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        if not self.threshold:
+            return True
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.cooldown or host in self._trial:
+                return False
+            self._trial.add(host)
+            return True
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial.discard(host)
+
+    def record_failure(self, host, failure_class):
+        with self._lock:
+            if not FAILURE_CLASSES[failure_class][1]:
+                # Fallos del navegador o nuestros no dicen nada del host: permitir otra prueba
+                self._trial.discard(host)
+                return
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if host in self._trial or self._failures[host] >= self.threshold:
+                self._opened_at[host] = time.monotonic()
+                self._trial.discard(host)
+
+    def state(self, host):
+        with self._lock:
+            if host not in self._opened_at:
+                return "closed"
+            return "half_open" if host in self._trial else "open"
@@ -0,0 +1,147 @@
+"""Full-page capture through the DevTools Page.captureScreenshot API"""
+import base64
+import io
+import struct
+import zlib
+
+from PIL import Image
+
+from ..config.constants import FULL_PAGE_TILE_THRESHOLD, FULL_PAGE_TILE_HEIGHT, FULL_PAGE_MAX_HEIGHT
+
+# Mide la altura real del contenido. Si el documento no hace scroll pero un
+# elemento interno sí (layouts con height: 100vh y overflow: auto), se deja
+# que ese contenido fluya en el documento y se guardan los estilos originales.
+MEASURE_PAGE_SCRIPT = """
+var root = document.scrollingElement || document.documentElement;
+var bodyHeight = document.body ? document.body.scrollHeight : 0;
+var height = Math.max(root.scrollHeight, bodyHeight);
+var scroller = null;
+if (height <= window.innerHeight + 1 && document.body) {
+    var best = null, bestExtra = 0;
+    var elements = document.body.getElementsByTagName('*');
+    for (var i = 0; i < elements.length; i++) {
+        var el = elements[i];
+        var extra = el.scrollHeight - el.clientHeight;
+        if (extra <= bestExtra || el.clientHeight < window.innerHeight / 2) { continue; }
+        var overflowY = getComputedStyle(el).overflowY;
+        if (overflowY !== 'auto' && overflowY !== 'scroll') { continue; }
+        best = el;
+        bestExtra = extra;
+    }
+    if (best) {
+        window.__benderUnclipped = [];
+        for (var node = best; node && node.style; node = node.parentElement) {
+            window.__benderUnclipped.push([node, node.style.cssText]);
+            node.style.setProperty('height', 'auto', 'important');
+            node.style.setProperty('max-height', 'none', 'important');
+            node.style.setProperty('overflow', 'visible', 'important');
+        }
+        scroller = best.tagName.toLowerCase() + (best.id ? '#' + best.id : '');
+        height = Math.max(root.scrollHeight, document.body.scrollHeight);
+    }
+}
+return {height: height, scroller: scroller};
+"""
+
+RESTORE_PAGE_SCRIPT = """
+(window.__benderUnclipped || []).forEach(function(entry) { entry[0].style.cssText = entry[1]; });
+window.__benderUnclipped = null;
+"""
+
+
+class StreamingPngWriter:
+    """Write an RGB PNG row by row so the full bitmap never sits in memory.
+
+    Rows are deflated as they arrive; the IHDR is rewritten on close with
+    the final height, so the fileobj must be seekable.
+    """
+
+    def __init__(self, fileobj, width):
+        self.fileobj = fileobj
+        self.width = width
+        self.height = 0
+        self._compressor = zlib.compressobj(6)
+        self.fileobj.write(b"\x89PNG\r\n\x1a\n")
+        self._ihdr_offset = self.fileobj.tell()
+        self._write_ihdr()
+
+    def _chunk(self, kind, data):
+        self.fileobj.write(struct.pack(">I", len(data)))
+        self.fileobj.write(kind + data)
+        self.fileobj.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def _write_ihdr(self):
+        # 8 bits por canal, color type 2 (RGB), sin entrelazado
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0))
+
+    def write_image(self, image):
+        """Append the rows of a PIL image (cropped or padded to the PNG width)"""
+        if image.width != self.width:
+            canvas = Image.new("RGB", (self.width, image.height), "white")
+            canvas.paste(image, (0, 0))
+            image = canvas
+        raw = image.convert("RGB").tobytes()
+        stride = self.width * 3
+        # Filtro 0 (None) delante de cada fila
+        rows = b"".join(b"\x00" + raw[offset:offset + stride] for offset in range(0, len(raw), stride))
+        data = self._compressor.compress(rows)
+        if data:
+            self._chunk(b"IDAT", data)
+        self.height += image.height
+
+    def close(self):
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        end = self.fileobj.tell()
+        self.fileobj.seek(self._ihdr_offset)
+        self._write_ihdr()
+        self.fileobj.seek(end)
+
+
+def _capture_clip(driver, x, y, width, height):
+    result = driver.execute_cdp_cmd("Page.captureScreenshot", {
+        "format": "png",
+        "captureBeyondViewport": True,
+        "clip": {"x": x, "y": y, "width": width, "height": height, "scale": 1},
+    })
+    return base64.b64decode(result["data"])
+
+
+def capture_full_page(driver, width):
+    """Capture the whole page at the current viewport width.
+
+    Pages up to FULL_PAGE_TILE_THRESHOLD px tall are captured in one
+    Page.captureScreenshot call beyond the viewport; taller pages are
+    captured in FULL_PAGE_TILE_HEIGHT tiles streamed into the final PNG.
+    Returns the PNG bytes and a dict describing the capture.
+    """
+    page = driver.execute_script(MEASURE_PAGE_SCRIPT)
+    try:
+        content_height = int(page["height"])
+        height = min(content_height, FULL_PAGE_MAX_HEIGHT)
+        info = {
+            "height": height,
+            "tiles": 1,
+            "truncated": content_height > height,
+            "scroller": page["scroller"],
+        }
+
+        if height <= FULL_PAGE_TILE_THRESHOLD:
+            return _capture_clip(driver, 0, 0, width, height), info
+
+        output = io.BytesIO()
+        writer = None
+        tiles = 0
+        for y in range(0, height, FULL_PAGE_TILE_HEIGHT):
+            tile_height = min(FULL_PAGE_TILE_HEIGHT, height - y)
+            with Image.open(io.BytesIO(_capture_clip(driver, 0, y, width, tile_height))) as tile:
+                if writer is None:
+                    writer = StreamingPngWriter(output, tile.width)
+                writer.write_image(tile)
+            tiles += 1
+        writer.close()
+        info["tiles"] = tiles
+        return output.getvalue(), info
+    finally:
+        if page.get("scroller"):
+            driver.execute_script(RESTORE_PAGE_SCRIPT)
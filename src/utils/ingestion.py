@@ -0,0 +1,141 @@
+"""Streaming ingestion of large URL lists (TXT, CSV and sitemap XML, optionally gzipped)"""
+import csv
+import gzip
+import io
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import List
+from urllib.parse import urlsplit, urlunsplit
+
+from ..config.constants import INGEST_BATCH_SIZE
+from .validation import validate_url
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+_MAX_INVALID_SAMPLES = 5
+
+
+@dataclass
+class IngestSummary:
+    """Outcome of adding a batch of URLs to the queue"""
+    total: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    urls: List[str] = field(default_factory=list)
+    invalid_samples: List[str] = field(default_factory=list)
+
+    @property
+    def added(self):
+        return len(self.urls)
+
+
+def normalize_url(url):
+    """Canonical form used for dedup: lowercase scheme and host, no default port or fragment"""
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6: hostname viene sin corchetes
+    netloc = host
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{host}"
+    if port is not None and str(port) != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def _open_binary(fileobj):
+    """Wrap fileobj in a gzip reader when its content is gzip-compressed"""
+    stream = io.BufferedReader(fileobj) if not hasattr(fileobj, "peek") else fileobj
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def _iter_sitemap(stream):
+    for _, element in ET.iterparse(stream, events=("end",)):
+        # Las etiquetas vienen con namespace: {http://www.sitemaps.org/...}loc
+        if element.tag.rsplit("}", 1)[-1] == "loc" and element.text:
+            yield element.text.strip()
+        element.clear()
+
+
+def _is_header(cells):
+    """A first CSV row with no URL-like cell (e.g. "url,name") is a header"""
+    return not any("://" in cell or "." in cell for cell in cells)
+
+
+def _iter_csv(text):
+    first = True
+    for row in csv.reader(text):
+        cells = [cell.strip() for cell in row if cell.strip()]
+        if not cells:
+            continue
+        if first:
+            first = False
+            if _is_header(cells):
+                continue
+        # Primera celda que parezca una URL; si no hay, la primera
+        yield next((cell for cell in cells if cell.startswith(("http://", "https://"))), cells[0])
+
+
+def iter_uploaded_urls(fileobj, filename):
+    """Yield raw URLs from an uploaded file without decoding it all at once"""
+    name = filename.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    stream = _open_binary(fileobj)
+
+    if name.endswith(".xml"):
+        yield from _iter_sitemap(stream)
+        return
+
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline="")
+    if name.endswith(".csv"):
+        yield from _iter_csv(text)
+    else:
+        for line in text:
+            if line.strip():
+                yield line.strip()
+
+
+def ingest_urls(raw_urls, existing=(), batch_size=INGEST_BATCH_SIZE, on_batch=None):
+    """Normalize, dedupe and validate URLs against the ones already queued.
+
+    URLs are handled in batches of batch_size; on_batch(summary) is called
+    after each one so callers can report progress. Duplicates are dropped
+    with a set lookup before the (slower) validation runs.
+    """
+    seen = {normalize_url(url) for url in existing}
+    summary = IngestSummary()
+    batch = []
+
+    def flush():
+        for url in batch:
+            if validate_url(url):
+                summary.urls.append(url)
+            else:
+                summary.invalid += 1
+                if len(summary.invalid_samples) < _MAX_INVALID_SAMPLES:
+                    summary.invalid_samples.append(url)
+        batch.clear()
+        if on_batch:
+            on_batch(summary)
+
+    for raw_url in raw_urls:
+        summary.total += 1
+        url = normalize_url(raw_url)
+        if url in seen:
+            summary.duplicates += 1
+            continue
+        seen.add(url)
+        batch.append(url)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return summary
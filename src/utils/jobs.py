@@ -0,0 +1,470 @@
+"""Background capture jobs with a durable SQLite job store"""
+import json
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime
+
+from ..config.constants import (
+    JOBS_DB_PATH, JOBS_DIR, MAX_CONCURRENT_JOBS, MAX_PENDING_JOBS, THUMBNAIL_FORMAT, JOB_RETENTION, BLOB_GC_INTERVAL,
+)
+from .blob_store import BlobQuotaExceeded, get_blob_store
+from .capture_engine import CaptureEngine, CaptureTask
+from .encoding import encode_results
+from .export import ZipExporter
+from .process_pool import get_process_pool
+from .screenshot import CaptureOptions
+from .telemetry import record_span, span, trace_context
+from .thumbnails import THUMBNAIL_MEDIA_TYPES, make_thumbnail
+
+logger = logging.getLogger(__name__)
+
+# Namespace del BlobStore para jobs enviados sin sesión
+ANONYMOUS_NAMESPACE = "anonymous"
+
+# Estados de un job: queued -> running -> done | failed
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    status TEXT NOT NULL,
+    options TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    owner TEXT,  -- host:pid of the process running the job
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    resolution_name TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    path TEXT,  -- key of the image in the BlobStore
+    thumbnail TEXT,  -- key of its preview in the BlobStore
+    error TEXT,
+    metadata TEXT,
+    duration REAL,
+    finished_at REAL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_finish ON tasks (job_id, finished_at);
+CREATE INDEX IF NOT EXISTS jobs_by_session ON jobs (session_id, created_at);
+"""
+
+# Columnas añadidas después de la primera versión del esquema
+_MIGRATIONS = (
+    "ALTER TABLE tasks ADD COLUMN thumbnail TEXT",
+    "ALTER TABLE jobs ADD COLUMN owner TEXT",
+)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued or running"""
+
+
+def process_owner():
+    """Identifier of this process as stored in jobs.owner"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner):
+    host, _, pid = (owner or "").rpartition(":")
+    if host != socket.gethostname():
+        return True  # No podemos comprobarlo: asumir que sigue vivo
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _row_to_dict(row):
+    data = dict(row)
+    for key in ("options", "metadata"):
+        if data.get(key):
+            data[key] = json.loads(data[key])
+    return data
+
+
+class JobStore:
+    """SQLite-backed record of jobs and their per-task results.
+
+    Every method opens its own connection so the store can be shared by
+    the Streamlit script threads and the background job threads.
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH):
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            for migration in _MIGRATIONS:
+                try:
+                    conn.execute(migration)
+                except sqlite3.OperationalError:
+                    pass  # Ya aplicada
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _write(self, sql, params=()):
+        with self._write_lock, self._connect() as conn:
+            conn.execute(sql, params)
+
+    def create_job(self, job_id, session_id, options, tasks, owner=None):
+        """Insert a queued job with one pending row per CaptureTask"""
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, session_id, status, options, total, owner, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, session_id, JOB_QUEUED, json.dumps(asdict(options)), len(tasks), owner, time.time()),
+            )
+            conn.executemany(
+                "INSERT INTO tasks (job_id, seq, url, resolution_name, width, height) VALUES (?, ?, ?, ?, ?, ?)",
+                [(job_id, seq, t.url, t.resolution_name, t.width, t.height) for seq, t in enumerate(tasks)],
+            )
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def get_task(self, job_id, seq):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM tasks WHERE job_id = ? AND seq = ?", (job_id, seq)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list_tasks(self, job_id, status=None):
+        """Return the job's tasks in submission order, optionally filtered by status"""
+        sql = "SELECT * FROM tasks WHERE job_id = ?"
+        params = [job_id]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        with self._connect() as conn:
+            rows = conn.execute(sql + " ORDER BY seq", params).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def list_events(self, job_id, since=0.0, limit=None):
+        """Return finished tasks in order of completion, newer than since"""
+        sql = "SELECT * FROM tasks WHERE job_id = ? AND finished_at > ? ORDER BY finished_at"
+        params = [job_id, since]
+        if limit:
+            sql = f"SELECT * FROM ({sql} DESC LIMIT ?) ORDER BY finished_at"
+            params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def list_unfinished_jobs(self):
+        """Return (id, owner) of every queued or running job, oldest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner FROM jobs WHERE status IN (?, ?) ORDER BY created_at", ACTIVE_JOB_STATUSES
+            ).fetchall()
+        return [(row["id"], row["owner"]) for row in rows]
+
+    def count_active_jobs(self, owner=None):
+        """Number of queued or running jobs, optionally only those run by owner"""
+        sql = "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)"
+        params = list(ACTIVE_JOB_STATUSES)
+        if owner:
+            sql += " AND owner = ?"
+            params.append(owner)
+        with self._connect() as conn:
+            return conn.execute(sql, params).fetchone()[0]
+
+    def count_cache_hits(self, job_id):
+        """Number of the job's captures served from the capture cache"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status = 'done' "
+                "AND json_extract(metadata, '$.cache') = 'hit'",
+                (job_id,),
+            ).fetchone()[0]
+
+    def claim_job(self, job_id, previous_owner, owner):
+        """Take over a job from previous_owner; False if another process got it first"""
+        with self._write_lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET owner = ? WHERE id = ? AND owner IS ?", (owner, job_id, previous_owner)
+            )
+            return cursor.rowcount == 1
+
+    def mark_running(self, job_id):
+        self._write(
+            "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+            (JOB_RUNNING, time.time(), job_id),
+        )
+
+    def record_result(self, job_id, seq, path=None, error=None, metadata=None, duration=None):
+        """Store the outcome of one task and bump the job counters"""
+        status = "done" if error is None else "failed"
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, path = ?, error = ?, metadata = ?, duration = ?, finished_at = ? "
+                "WHERE job_id = ? AND seq = ?",
+                (status, path, error, json.dumps(metadata or {}), duration, time.time(), job_id, seq),
+            )
+            counter = "completed" if error is None else "failed"
+            conn.execute(f"UPDATE jobs SET {counter} = {counter} + 1 WHERE id = ?", (job_id,))
+
+    def set_thumbnail(self, job_id, seq, key):
+        self._write("UPDATE tasks SET thumbnail = ? WHERE job_id = ? AND seq = ?", (key, job_id, seq))
+
+    def delete_finished_jobs(self, before):
+        """Delete jobs that finished before the given time; return their (id, session_id)"""
+        with self._write_lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, session_id FROM jobs WHERE status NOT IN (?, ?) AND finished_at < ?",
+                (*ACTIVE_JOB_STATUSES, before),
+            ).fetchall()
+            for row in rows:
+                conn.execute("DELETE FROM tasks WHERE job_id = ?", (row["id"],))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+        return [(row["id"], row["session_id"]) for row in rows]
+
+    def finish_job(self, job_id, status=JOB_DONE, error=None):
+        self._write(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, error, time.time(), job_id),
+        )
+
+
+class JobRunner:
+    """Run capture jobs on background threads, sharing a single CaptureEngine.
+
+    Jobs are persisted in a JobStore before they start and every finished
+    task is written as soon as it completes, so progress survives Streamlit
+    reruns, browser disconnects and process restarts. Several processes
+    (the UI and the HTTP API) can share one store: each job records the
+    process running it and is only resumed once that process is gone.
+
+    At most max_pending jobs of this process may be queued or running;
+    submit() raises JobQueueFull beyond that. Jobs finished more than
+    retention seconds ago are deleted with their archive and images.
+    """
+
+    def __init__(self, store=None, engine=None, blobs=None, max_jobs=MAX_CONCURRENT_JOBS, jobs_dir=JOBS_DIR,
+                 max_pending=MAX_PENDING_JOBS, retention=JOB_RETENTION):
+        self.store = store or JobStore()
+        self.engine = engine or CaptureEngine()
+        self.blobs = blobs or get_blob_store()
+        self.jobs_dir = jobs_dir
+        self.max_pending = max_pending
+        self.retention = retention
+        self.owner = process_owner()
+        self._last_gc = 0.0
+        self._submit_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="capture-job")
+
+    def submit(self, urls, resolutions, options=None, session_id=None):
+        """Queue a job capturing every URL at every resolution and return its id.
+
+        resolutions maps resolution names to (width, height).
+        """
+        options = options or CaptureOptions()
+        tasks = [
+            CaptureTask(url, name, width, height)
+            for url in urls
+            for name, (width, height) in resolutions.items()
+        ]
+        job_id = uuid.uuid4().hex
+        with self._submit_lock:
+            if self.max_pending and self.store.count_active_jobs(self.owner) >= self.max_pending:
+                raise JobQueueFull(f"{self.max_pending} capture jobs are already queued or running")
+            self.store.create_job(job_id, session_id, options, tasks, owner=self.owner)
+        self._executor.submit(self._run_job, job_id)
+        self.maybe_gc()
+        return job_id
+
+    def gc(self):
+        """Delete old finished jobs: their rows, ZIP archive and stored images"""
+        removed = self.store.delete_finished_jobs(time.time() - self.retention)
+        for job_id, session_id in removed:
+            shutil.rmtree(os.path.join(self.jobs_dir, job_id), ignore_errors=True)
+            try:
+                self.blobs.delete_prefix(session_id or ANONYMOUS_NAMESPACE, job_id)
+            except ValueError:
+                pass  # Namespace con nombre no válido: nunca se guardó nada en él
+        if removed:
+            logger.info("Removed %d finished capture jobs", len(removed))
+        return len(removed)
+
+    def maybe_gc(self):
+        """Run gc() at most once every BLOB_GC_INTERVAL seconds"""
+        now = time.time()
+        with self._submit_lock:
+            if not self.retention or now - self._last_gc < BLOB_GC_INTERVAL:
+                return
+            self._last_gc = now
+        try:
+            self.gc()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Capture job garbage collection failed: %s", e)
+
+    def resume_unfinished(self):
+        """Requeue jobs left queued or running by a process that has stopped"""
+        self.maybe_gc()
+        for job_id, owner in self.store.list_unfinished_jobs():
+            if owner == self.owner or (owner and _owner_alive(owner)):
+                continue
+            if self.store.claim_job(job_id, owner, self.owner):
+                logger.info("Resuming capture job %s", job_id)
+                self._executor.submit(self._run_job, job_id)
+
+    def archive_path(self, job_id):
+        """Path of the job's finished ZIP archive, or None while it is being built"""
+        path = os.path.join(self.jobs_dir, job_id, "screenshots.zip")
+        return path if os.path.exists(path) else None
+
+    def blob_ref(self, task):
+        """BlobRef of the image stored for a finished task row"""
+        return self.blobs.ref(task["path"])
+
+    def load_screenshot(self, task):
+        """Read the image stored for a finished task row"""
+        return self.blobs.read(self.blob_ref(task))
+
+    def _submit_thumbnail(self, job, seq, key):
+        """Start generating a stored image's preview in the process pool"""
+        submitted_at = time.perf_counter()
+        future = get_process_pool().submit(make_thumbnail, self.blobs.path(self.blobs.ref(key)))
+
+        def record_encode(done):
+            # Solo mide (incluida la espera en la cola del pool); se guarda en _store_thumbnail
+            record_span("encode", time.perf_counter() - submitted_at,
+                        outcome="ok" if done.exception() is None else "error",
+                        job=job["id"], seq=seq, target="thumbnail")
+
+        future.add_done_callback(record_encode)
+        return future
+
+    def _store_thumbnail(self, job, seq, key, future):
+        """Save a preview started by _submit_thumbnail once it is ready"""
+        try:
+            ref = self.blobs.put(
+                self.blobs.ref(key).namespace,
+                f"{job['id']}/{seq:06d}.thumb.{THUMBNAIL_FORMAT.lower()}",
+                future.result(),
+                media_type=THUMBNAIL_MEDIA_TYPES[THUMBNAIL_FORMAT],
+            )
+            self.store.set_thumbnail(job["id"], seq, ref.key)
+        except Exception as e:
+            # Sin miniatura la galería muestra la imagen completa
+            logger.warning("Could not create thumbnail for %s: %s", key, e)
+
+    def _save_screenshot(self, job, seq, result, data, encoding):
+        ref = self.blobs.put(
+            job["session_id"] or ANONYMOUS_NAMESPACE,
+            f"{job['id']}/{seq:06d}.{encoding['extension']}",
+            data,
+            media_type=encoding["media_type"],
+            metadata={"url": result.task.url, "resolution_name": result.task.resolution_name},
+        )
+        return ref.key
+
+    def _run_job(self, job_id):
+        job = self.store.get_job(job_id)
+        if job is None:
+            return
+        exporter = None
+        try:
+            options = CaptureOptions(**job["options"])
+            rows = self.store.list_tasks(job_id, status="pending")
+            tasks = [CaptureTask(r["url"], r["resolution_name"], r["width"], r["height"]) for r in rows]
+            # Las tareas son iguales por valor; identificamos cada una por objeto
+            seq_by_task = {id(task): row["seq"] for task, row in zip(tasks, rows)}
+
+            # The archive grows as captures finish, so it is ready when the job ends
+            exporter = ZipExporter(
+                os.path.join(self.jobs_dir, job_id, "screenshots.zip"),
+                timestamp=datetime.fromtimestamp(job["created_at"]),
+            )
+            for row in self.store.list_tasks(job_id, status="done"):
+                # Job resumed after a restart: re-add what was already captured
+                extension = os.path.splitext(row["path"])[1].lstrip(".") or "png"
+                try:
+                    data = self.load_screenshot(row)
+                except (OSError, ValueError):
+                    logger.warning("Image of %s (%s) is gone; leaving it out of the archive", row["url"], row["resolution_name"])
+                    continue
+                exporter.add(row["url"], row["resolution_name"], data, extension=extension)
+
+            thumbnails = []
+            self.store.mark_running(job_id)
+            with trace_context(job=job_id):
+                results = self.engine.map(tasks, options)
+                # Encoding runs in the process pool while the browsers keep capturing
+                for result, data, encoding in encode_results(results, options):
+                    seq = seq_by_task[id(result.task)]
+                    path = None
+                    error = result.error
+                    metadata = result.metadata
+                    if result.ok:
+                        metadata = {**metadata, "encoding": encoding}
+                        try:
+                            with span("storage", url=result.task.url, resolution=result.task.resolution_name,
+                                      bytes=len(data)):
+                                path = self._save_screenshot(job, seq, result, data, encoding)
+                                exporter.add(result.task.url, result.task.resolution_name, data,
+                                             extension=encoding["extension"])
+                        except BlobQuotaExceeded as e:
+                            error = str(e)
+                    self.store.record_result(
+                        job_id, seq, path=path, error=error,
+                        metadata=metadata, duration=result.duration,
+                    )
+                    if path:
+                        thumbnails.append((seq, path, self._submit_thumbnail(job, seq, path)))
+            exporter.close()
+            # Previews are usually done long before the last capture; don't report the job finished without them.
+            # They are stored here, not in done-callbacks, which may still be running once the futures are done.
+            for seq, path, future in thumbnails:
+                self._store_thumbnail(job, seq, path, future)
+            self.store.finish_job(job_id)
+        except Exception as e:
+            logger.exception("Capture job %s failed", job_id)
+            if exporter is not None:
+                exporter.abort()
+            self.store.finish_job(job_id, status=JOB_FAILED, error=str(e))
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Return the process-wide JobRunner, resuming unfinished jobs on first use"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+            _runner.resume_unfinished()
+        return _runner
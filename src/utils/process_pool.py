@@ -0,0 +1,22 @@
+"""Shared worker process pool for CPU-bound image work"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from ..config.constants import IMAGE_WORKERS
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Return the process-wide ProcessPoolExecutor used for image processing"""
+    global _pool
+    with _pool_lock:
+        # Si un worker murió el pool queda inutilizable: crear uno nuevo
+        if _pool is None or getattr(_pool, "_broken", False):
+            workers = IMAGE_WORKERS or min(4, os.cpu_count() or 1)
+            # "spawn" evita hacer fork de un proceso con hilos (Streamlit, workers de captura)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
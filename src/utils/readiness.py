@@ -0,0 +1,132 @@
+"""Adaptive page-readiness detection used before taking a screenshot"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from ..config.constants import READINESS_POLICIES, DEFAULT_READINESS_POLICY
+from .devtools import NetworkMonitor
+
+# Se instala en cada documento nuevo para registrar la última mutación del DOM
+READINESS_PROBE_SCRIPT = """
+(function() {
+    if (window.__benderReadiness) { return; }
+    var state = window.__benderReadiness = {lastMutation: performance.now()};
+    new MutationObserver(function() {
+        state.lastMutation = performance.now();
+    }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+})();
+"""
+
+# Devuelve en una sola llamada el estado de todas las señales del lado del navegador
+READINESS_CHECK_SCRIPT = READINESS_PROBE_SCRIPT + """
+var state = window.__benderReadiness;
+var images = Array.prototype.every.call(document.images, function(img) {
+    // Las imágenes lazy fuera de pantalla no cargan hasta que se hace scroll
+    return img.complete || img.loading === 'lazy';
+});
+return {
+    readyState: document.readyState,
+    domQuietMs: performance.now() - state.lastMutation,
+    fontsLoaded: !document.fonts || document.fonts.status === 'loaded',
+    imagesLoaded: images
+};
+"""
+
+
+@dataclass(frozen=True)
+class ReadinessPolicy:
+    """Which signals must hold before a page counts as ready.
+
+    A zero for network_idle_ms or dom_quiet_ms disables that check;
+    timeout is the hard upper bound on the whole wait.
+    """
+    name: str = DEFAULT_READINESS_POLICY
+    ready_state: bool = True
+    network_idle_ms: int = 500
+    network_max_inflight: int = 0
+    dom_quiet_ms: int = 500
+    fonts: bool = True
+    images: bool = True
+    timeout: float = 15.0
+    poll_interval: float = 0.1
+
+
+@dataclass
+class ReadinessOutcome:
+    """How the readiness wait ended"""
+    condition: str
+    waited: float
+    pending: List[str] = field(default_factory=list)
+    network_requests: int = 0
+    signals: Dict[str, float] = field(default_factory=dict)
+
+
+def get_readiness_policy(name=None):
+    """Build the ReadinessPolicy registered under name in READINESS_POLICIES"""
+    name = name or DEFAULT_READINESS_POLICY
+    if name not in READINESS_POLICIES:
+        raise ValueError(f"Unknown readiness policy: {name}")
+    return ReadinessPolicy(name=name, **READINESS_POLICIES[name])
+
+
+def install_readiness_probe(driver):
+    """Register the DOM mutation probe so it runs before any page script"""
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": READINESS_PROBE_SCRIPT})
+
+
+def _pending_signals(policy, state, monitor):
+    pending = []
+    if policy.ready_state and state.get("readyState") != "complete":
+        pending.append("ready_state")
+    if policy.network_idle_ms and monitor.available and monitor.idle_for() * 1000 < policy.network_idle_ms:
+        pending.append("network_idle")
+    if policy.dom_quiet_ms and state.get("domQuietMs", 0) < policy.dom_quiet_ms:
+        pending.append("dom_quiet")
+    if policy.fonts and not state.get("fontsLoaded", True):
+        pending.append("fonts")
+    if policy.images and not state.get("imagesLoaded", True):
+        pending.append("images")
+    return pending
+
+
+def wait_for_page_ready(driver, policy=None, monitor=None):
+    """Poll the page until every signal in policy holds or the timeout expires.
+
+    The returned outcome names the condition that ended the wait: the last
+    signal to become satisfied, or "timeout" together with the signals
+    that were still pending.
+    """
+    policy = policy or get_readiness_policy()
+    if monitor is None:
+        monitor = NetworkMonitor(driver, max_inflight=policy.network_max_inflight)
+
+    start = time.monotonic()
+    satisfied_at = {}
+    pending = []
+    while True:
+        monitor.poll()
+        state = driver.execute_script(READINESS_CHECK_SCRIPT) or {}
+        pending = _pending_signals(policy, state, monitor)
+        elapsed = time.monotonic() - start
+
+        for signal in ("ready_state", "network_idle", "dom_quiet", "fonts", "images"):
+            if signal in pending:
+                satisfied_at.pop(signal, None)
+            else:
+                satisfied_at.setdefault(signal, elapsed)
+
+        if not pending:
+            condition = max(satisfied_at, key=satisfied_at.get) if satisfied_at else "ready_state"
+            break
+        if elapsed >= policy.timeout:
+            condition = "timeout"
+            break
+        time.sleep(policy.poll_interval)
+
+    return ReadinessOutcome(
+        condition=condition,
+        waited=round(time.monotonic() - start, 3),
+        pending=pending,
+        network_requests=monitor.requests,
+        signals={signal: round(at, 3) for signal, at in satisfied_at.items()},
+    )
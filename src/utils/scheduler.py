@@ -0,0 +1,112 @@
+"""Host-aware task scheduler for the capture engine"""
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+from ..config.constants import MAX_TASKS_PER_HOST
+
+
+def task_host(url):
+    """Scheduling key of a URL: its host, as in urlparse(url).netloc"""
+    return urlparse(url).netloc.lower()
+
+
+class HostScheduler:
+    """Blocking queue that hands out work fairly across hosts and priorities.
+
+    Items are grouped by priority (lower runs first) and, within a priority,
+    by host. get() walks the hosts round-robin so a long crawl of one site
+    does not hold back the other sites queued after it, and never hands
+    out more than per_host_limit items of the same host at once; done(host)
+    frees the slot again. Items of the same host keep their FIFO order.
+    """
+
+    def __init__(self, per_host_limit=MAX_TASKS_PER_HOST):
+        self.per_host_limit = per_host_limit
+        self._queues = {}  # priority -> {host: deque(items)}
+        self._rotation = {}  # priority -> deque(hosts) en orden de turno
+        self._inflight = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return self._size
+
+    def put(self, item, host, priority=0):
+        with self._cond:
+            hosts = self._queues.setdefault(priority, {})
+            if host not in hosts:
+                hosts[host] = deque()
+                self._rotation.setdefault(priority, deque()).append(host)
+            hosts[host].append(item)
+            self._size += 1
+            self._cond.notify()
+
+    def get(self):
+        """Block until an item can run and return (item, host).
+
+        Returns (None, None) once close() has been called and the queue is empty.
+        """
+        with self._cond:
+            while True:
+                picked = self._pick()
+                if picked is not None:
+                    return picked
+                if self._closed and not self._size:
+                    return None, None
+                # Hay trabajo pero todos sus hosts están al límite: esperar a done()
+                self._cond.wait()
+
+    def done(self, host):
+        """Release the slot taken by an item of host returned by get()"""
+        with self._cond:
+            self._inflight[host] -= 1
+            if not self._inflight[host]:
+                del self._inflight[host]
+            self._cond.notify_all()
+
+    def inflight(self, host):
+        with self._cond:
+            return self._inflight.get(host, 0)
+
+    def close(self, discard=False):
+        """Wake every waiting get() once the remaining items have been handed out.
+
+        With discard=True the items still queued are dropped instead and
+        returned, so get() stops as soon as the running items are done.
+        """
+        with self._cond:
+            self._closed = True
+            dropped = []
+            if discard:
+                for hosts in self._queues.values():
+                    for items in hosts.values():
+                        dropped.extend(items)
+                self._queues.clear()
+                self._rotation.clear()
+                self._size = 0
+            self._cond.notify_all()
+            return dropped
+
+    def _pick(self):
+        for priority in sorted(self._queues):
+            hosts = self._queues[priority]
+            rotation = self._rotation[priority]
+            for _ in range(len(rotation)):
+                host = rotation[0]
+                rotation.rotate(-1)
+                if self.per_host_limit and self._inflight.get(host, 0) >= self.per_host_limit:
+                    continue
+                item = hosts[host].popleft()
+                if not hosts[host]:
+                    del hosts[host]
+                    rotation.remove(host)
+                if not hosts:
+                    del self._queues[priority]
+                    del self._rotation[priority]
+                self._inflight[host] = self._inflight.get(host, 0) + 1
+                self._size -= 1
+                return item, host
+        return None
@@ -1,34 +1,79 @@
-import time
+import logging
+import threading
+from dataclasses import dataclass, asdict
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium_stealth import stealth
-import streamlit as st
-from PIL import Image
-from io import BytesIO
-import zipfile
-import io
-from datetime import datetime
-from urllib.parse import urlparse
 import chromedriver_autoinstaller
-from ..config.constants import CHROME_OPTIONS
+from ..config.constants import (
+    CHROME_OPTIONS, DEFAULT_READINESS_POLICY, DEFAULT_BLOCKING_PROFILE, DEFAULT_JOB_PRIORITY, DEVICE_PROFILES,
+    PAGE_LOAD_TIMEOUT, SCRIPT_TIMEOUT, DEFAULT_OUTPUT_FORMAT, DEFAULT_OUTPUT_QUALITY,
+)
+from .consent import dismiss_consent
+from .devtools import NetworkMonitor, PERFORMANCE_LOGGING_CAPABILITY, apply_request_blocking
+from .fullpage import capture_full_page
+from .readiness import get_readiness_policy, install_readiness_probe, wait_for_page_ready
+from .telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CaptureOptions:
+    """Per-job capture settings"""
+    readiness: str = DEFAULT_READINESS_POLICY
+    # Cargar la página una sola vez y capturar todas las resoluciones desde esa carga
+    multi_viewport: bool = True
+    # "use" lee y guarda en la caché de capturas, "refresh" solo guarda, "bypass" la ignora
+    cache_mode: str = "use"
+    # Perfil de REQUEST_BLOCKING_PROFILES: anuncios, analítica, vídeo...
+    blocking: str = DEFAULT_BLOCKING_PROFILE
+    # Prioridad en el scheduler (JOB_PRIORITIES); no cambia la imagen
+    priority: str = DEFAULT_JOB_PRIORITY
+    # Formato de salida (OUTPUT_FORMATS); la captura se recodifica después, no cambia cómo se toma
+    output_format: str = DEFAULT_OUTPUT_FORMAT
+    output_quality: int = DEFAULT_OUTPUT_QUALITY
+    # Lado más largo en px de la imagen guardada; 0 = sin reducir
+    max_dimension: int = 0
+    # Recomprimir el PNG (más lento, sin pérdida); solo aplica al formato "png"
+    png_optimize: bool = False
+    # Comparar con la ejecución anterior y reutilizar la imagen de las páginas sin cambios
+    incremental: bool = False
+
+
+# El instalador de ChromeDriver no es seguro si varios hilos escriben el binario
+# a la vez, y basta con ejecutarlo una vez por proceso.
+_install_lock = threading.Lock()
+_chromedriver_installed = False
+
+def install_chromedriver():
+    """Install a ChromeDriver matching the local Chrome, once per process"""
+    global _chromedriver_installed
+    with _install_lock:
+        if _chromedriver_installed:
+            return
+        try:
+            chromedriver_autoinstaller.install()
+        except Exception as e:
+            logger.warning("No se pudo instalar ChromeDriver automáticamente. Usando configuración por defecto: %s", e)
+        _chromedriver_installed = True
 
 def setup_webdriver():
     """Setup and return configured Chrome webdriver"""
-    try:
-        chromedriver_autoinstaller.install()
-    except Exception as e:
-        st.warning(f"No se pudo instalar ChromeDriver automáticamente. Usando configuración por defecto.")
+    install_chromedriver()
         
     options = Options()
     for option in CHROME_OPTIONS:
         options.add_argument(option)
+    # Eventos de red de DevTools para detectar cuándo la página deja de cargar
+    options.set_capability(*PERFORMANCE_LOGGING_CAPABILITY)
     
     try:
         # Primero creas el driver con las opciones
         driver = webdriver.Chrome(options=options)
+        # Una página colgada no debe bloquear el navegador indefinidamente
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.set_script_timeout(SCRIPT_TIMEOUT)
         
         # Luego aplicas stealth
         stealth(
@@ -40,99 +85,115 @@ def setup_webdriver():
             renderer="Intel Iris OpenGL Engine",
             fix_hairline=True,
         )
+        install_readiness_probe(driver)
 
         return driver
     except Exception as e:
-        st.error(f"Error al inicializar Chrome: {str(e)}")
-        st.info("Asegúrate de que Chrome y ChromeDriver estén instalados en el servidor.")
+        logger.error("Error al inicializar Chrome: %s. Asegúrate de que Chrome y ChromeDriver estén instalados en el servidor.", e)
         return None
 
 
-@st.cache_data
-def capture_screenshot(_driver, url, width, height):
-    """Capture screenshot using the provided driver"""
-    if _driver is None:
-        st.error("No se pudo inicializar el navegador.")
-        return None
-        
+def get_device_profile(resolution_name, width):
+    """Return the DEVICE_PROFILES entry used to emulate a resolution"""
+    for family, profile in DEVICE_PROFILES.items():
+        if resolution_name and resolution_name.startswith(family):
+            return profile
+    for profile in DEVICE_PROFILES.values():
+        if profile["max_width"] is None or width <= profile["max_width"]:
+            return profile
+    return DEVICE_PROFILES["Desktop"]
+
+
+def _emulate_device(driver, width, height, profile):
+    """Apply viewport size, DPR, touch and user agent through DevTools"""
+    driver.execute_cdp_cmd("Emulation.setDeviceMetricsOverride", {
+        "width": width,
+        "height": height,
+        "deviceScaleFactor": profile["device_scale_factor"],
+        "mobile": profile["mobile"],
+    })
+    driver.execute_cdp_cmd("Emulation.setTouchEmulationEnabled", {"enabled": profile["mobile"]})
+    driver.execute_cdp_cmd("Network.setUserAgentOverride", {
+        "userAgent": profile["user_agent"],
+        "platform": profile["platform"],
+    })
+
+
+def capture_resolutions(driver, url, resolutions, options=None, consent_memory=None):
+    """Load url once and capture it at every requested resolution.
+
+    resolutions is a list of (resolution_name, width, height). The page is
+    navigated with the first resolution's device profile; every following
+    resolution is produced by re-emulating device metrics and user agent
+    through DevTools and waiting for the layout to settle again. Sites that
+    serve different HTML per user agent keep the markup of the first one.
+
+    consent_memory is the ConsentMemory used to dismiss cookie banners
+    (the process-wide one by default).
+
+    Yields (resolution_name, png_bytes, metadata) as each capture is taken.
+    Runs on capture engine worker threads, so errors are raised to the
+    caller instead of being reported through Streamlit.
+    """
+    if driver is None:
+        raise RuntimeError("No se pudo inicializar el navegador.")
+    options = options or CaptureOptions()
+    policy = get_readiness_policy(options.readiness)
+
+    first_name, first_width, first_height = resolutions[0]
+    _emulate_device(driver, first_width, first_height, get_device_profile(first_name, first_width))
+    monitor = NetworkMonitor(driver, max_inflight=policy.network_max_inflight)
+    monitor.reset()
     try:
-        _driver.set_window_size(width, height)
-        _driver.get(url)
+        with span("navigate", resolution=first_name):
+            # Se aplica en cada captura ("none" incluido) porque el driver viene del pool
+            apply_request_blocking(driver, options.blocking)
+            driver.get(url)
+
+        # Wait until the page is ready according to the job's readiness policy
+        with span("readiness", resolution=first_name) as attributes:
+            readiness = wait_for_page_ready(driver, policy, monitor)
+            attributes["condition"] = readiness.condition
+        with span("cookies") as attributes:
+            try:
+                consent = dismiss_consent(driver, url, consent_memory)
+            except Exception as e:
+                # Un clic que recarga la página interrumpe el script; la captura sigue
+                logger.debug("Cookie banner handling failed on %s: %s", url, e)
+                consent = {"clicked": False, "error": str(e)}
+            attributes.update(clicked=consent.get("clicked"), source=consent.get("source"))
 
-        # Wait for the page to load fully
-        time.sleep(20)
+        for index, (resolution_name, width, height) in enumerate(resolutions):
+            metadata = {"readiness": asdict(readiness), "blocking": options.blocking, "consent": consent}
+            if index > 0:
+                with span("resize", resolution=resolution_name) as attributes:
+                    _emulate_device(driver, width, height, get_device_profile(resolution_name, width))
+                    driver.execute_script("window.scrollTo(0, 0)")
+                    # Responsive layouts re-render after the viewport change
+                    settle = wait_for_page_ready(driver, policy, monitor)
+                    metadata["settle"] = asdict(settle)
+                    attributes["condition"] = settle.condition
 
-        # Handle cookies pop-up if present
+            # Capture beyond the viewport instead of resizing it to the page height
+            with span("capture", resolution=resolution_name) as attributes:
+                screenshot, metadata["full_page"] = capture_full_page(driver, width)
+                attributes.update(bytes=len(screenshot), tiles=metadata["full_page"].get("tiles"))
+            monitor.poll()
+            # Contadores de toda la carga (incluidos los reajustes de viewport anteriores)
+            metadata["network"] = monitor.summary()
+            yield resolution_name, screenshot, metadata
+    finally:
+        # Los drivers se reutilizan entre páginas: no dejar la emulación aplicada
         try:
-            cookie_button = WebDriverWait(_driver, 5).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Aceptar') or contains(text(), 'Aceptar todas') or contains(text(), 'Agree') or contains(text(), 'Accept')]"))
-            )
-            cookie_button.click()
-            time.sleep(2)  # Wait for the pop-up to disappear
+            driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
         except Exception:
-            pass  # No cookie pop-up found, continue
+            pass
 
-        # Adjust window size for full page
-        total_height = _driver.execute_script("return document.body.scrollHeight")
-        _driver.set_window_size(width, total_height)
-        screenshot = _driver.get_screenshot_as_png()
-        return screenshot
-    except Exception as e:
-        st.error(f"Error al capturar screenshot de {url}: {str(e)}")
-        return None
 
-@st.cache_data
-def create_thumbnail(screenshot_data):
-    """Create a thumbnail from screenshot data"""
-    try:
-        # Abrir la imagen desde los bytes
-        image = Image.open(io.BytesIO(screenshot_data))
-        
-        # Calcular nuevo tamaño manteniendo el aspect ratio
-        # Aumentamos el tamaño para mejor calidad en pantallas de alta resolución
-        max_size = (1200, 800)  # Tamaño más grande para mejor calidad
-        
-        # Calcular el ratio de aspecto
-        aspect_ratio = image.width / image.height
-        
-        # Determinar el nuevo tamaño manteniendo el aspect ratio
-        if aspect_ratio > max_size[0] / max_size[1]:  # Imagen más ancha
-            new_width = max_size[0]
-            new_height = int(new_width / aspect_ratio)
-        else:  # Imagen más alta
-            new_height = max_size[1]
-            new_width = int(new_height * aspect_ratio)
-        
-        # Redimensionar usando el mejor método de interpolación
-        image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Convertir la imagen redimensionada a bytes con alta calidad
-        thumb_io = io.BytesIO()
-        image.save(thumb_io, format='PNG', quality=95, optimize=True)
-        return thumb_io.getvalue()
-    except Exception as e:
-        st.error(f"Error creating thumbnail: {str(e)}")
-        return None
+def capture_screenshot(driver, url, width, height, options=None, resolution_name=None):
+    """Capture a full-page screenshot of url at a single resolution.
 
-@st.cache_data
-def create_zip_file(screenshots_data):
-    """Create a ZIP file containing all screenshots"""
-    # Crear un buffer en memoria para el archivo ZIP
-    zip_buffer = io.BytesIO()
-    
-    # Crear el archivo ZIP
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for url, resolutions in screenshots_data.items():
-            # Obtener el dominio de la URL para usar en el nombre del archivo
-            domain = urlparse(url).netloc
-            
-            for resolution_name, screenshot_data in resolutions.items():
-                # Crear un nombre de archivo único para cada screenshot
-                filename = f"{domain}_{resolution_name.split()[0].lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-                
-                # Añadir el screenshot al archivo ZIP
-                zip_file.writestr(filename, screenshot_data)
-    
-    # Mover el puntero al inicio del buffer
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue() 
+    Returns the PNG bytes and a metadata dict describing the capture.
+    """
+    for _, screenshot, metadata in capture_resolutions(driver, url, [(resolution_name, width, height)], options):
+        return screenshot, metadata
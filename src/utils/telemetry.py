@@ -0,0 +1,254 @@
+"""Per-stage spans, a JSONL trace log and Prometheus-style metrics for the capture pipeline.
+
+Spans are written to TRACE_LOG_PATH, one JSON object per line, and folded
+into in-process counters, histograms and gauges that render_metrics()
+exposes in the Prometheus text format. This module must not import
+Streamlit or Selenium.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ..config.constants import TRACE_LOG_PATH, TRACE_LOG_MAX_MB, METRICS_HISTOGRAM_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+# Atributos (url, resolution, job, worker...) que heredan los spans abiertos en este hilo
+_trace_attributes = contextvars.ContextVar("trace_attributes", default={})
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters, gauges and histograms"""
+
+    def __init__(self, buckets=METRICS_HISTOGRAM_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._help = {}
+        self._types = {}
+        self._values = {}  # (name, labels) -> valor, o [counts, sum, count] en histogramas
+        self._lock = threading.Lock()
+
+    def _declare(self, name, kind, help_text):
+        self._types.setdefault(name, kind)
+        if help_text:
+            self._help.setdefault(name, help_text)
+
+    def inc(self, name, value=1, help_text=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, value, help_text=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._values[key] = value
+
+    def remove(self, name, **labels):
+        with self._lock:
+            self._values.pop((name, tuple(sorted(labels.items()))), None)
+
+    def observe(self, name, value, help_text=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = [counts, total + value, count + 1]
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: item[0])
+            types, helps = dict(self._types), dict(self._help)
+        lines = []
+        declared = set()
+        for (name, labels), value in values:
+            if name not in declared:
+                declared.add(name)
+                if name in helps:
+                    lines.append(f"# HELP {name} {helps[name]}")
+                lines.append(f"# TYPE {name} {types[name]}")
+            if types[name] == "histogram":
+                counts, total, count = value
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class TraceLog:
+    """Append-only JSONL file of spans, rotated to a single .1 backup at max_bytes"""
+
+    def __init__(self, path=TRACE_LOG_PATH, max_bytes=TRACE_LOG_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+                if self.max_bytes and self._file.tell() > self.max_bytes:
+                    self._file.close()
+                    os.replace(self.path, f"{self.path}.1")
+                    self._file = None
+            except OSError as e:
+                # La traza es diagnóstico: nunca debe tumbar una captura
+                logger.debug("Could not write trace record: %s", e)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+metrics = Metrics()
+trace_log = TraceLog()
+
+
+def current_trace_attributes():
+    """Attributes set by the enclosing trace_context blocks, to carry them to another thread"""
+    return dict(_trace_attributes.get())
+
+
+@contextmanager
+def trace_context(**attributes):
+    """Attach attributes (url, resolution, job...) to every span opened inside the block"""
+    token = _trace_attributes.set({**_trace_attributes.get(), **attributes})
+    try:
+        yield
+    finally:
+        _trace_attributes.reset(token)
+
+
+def record_span(stage, duration, outcome="ok", **attributes):
+    """Write a finished span to the trace log and the stage metrics"""
+    record = {
+        "ts": time.time(),
+        "stage": stage,
+        "duration": round(duration, 4),
+        "outcome": outcome,
+        "thread": threading.current_thread().name,
+        **_trace_attributes.get(),
+        **attributes,
+    }
+    trace_log.write(record)
+    metrics.observe(
+        "bender_stage_duration_seconds", duration,
+        help_text="Time spent in each capture pipeline stage", stage=stage, outcome=outcome,
+    )
+
+
+@contextmanager
+def span(stage, **attributes):
+    """Time a pipeline stage; the outcome is "error" with the exception class if it raises.
+
+    Yields the span's attribute dict so the block can add results to it.
+    """
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        record_span(stage, time.perf_counter() - start, outcome="error", error=e.__class__.__name__, **attributes)
+        raise
+    record_span(stage, time.perf_counter() - start, **attributes)
+
+
+def record_browser_usage(browser_id, rss_mb=None, cpu_seconds=None, pages=None):
+    """Publish a pooled browser's resource usage as gauges and a trace record"""
+    if rss_mb is not None:
+        metrics.set("bender_browser_rss_bytes", int(rss_mb * 1024 * 1024),
+                    help_text="Resident memory of a pooled Chrome and its child processes", browser=browser_id)
+    if cpu_seconds is not None:
+        metrics.set("bender_browser_cpu_seconds", round(cpu_seconds, 3),
+                    help_text="CPU time used by a pooled Chrome and its child processes", browser=browser_id)
+    if pages is not None:
+        metrics.set("bender_browser_pages", pages, help_text="Pages served by a pooled Chrome", browser=browser_id)
+    trace_log.write({
+        "ts": time.time(), "stage": "browser_usage", "browser": browser_id,
+        "rss_mb": None if rss_mb is None else round(rss_mb, 1),
+        "cpu_seconds": None if cpu_seconds is None else round(cpu_seconds, 3),
+        "pages": pages,
+    })
+
+
+def forget_browser(browser_id):
+    """Drop the gauges of a browser that has been recycled"""
+    for name in ("bender_browser_rss_bytes", "bender_browser_cpu_seconds", "bender_browser_pages"):
+        metrics.remove(name, browser=browser_id)
+
+
+def render_metrics():
+    return metrics.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Prometheus consulta cada pocos segundos: no llenar el log
+
+
+_server = None
+_server_attempted = False
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host, port):
+    """Serve /metrics from a background thread; only the first call per process does anything"""
+    global _server, _server_attempted
+    with _server_lock:
+        if _server_attempted or not port:
+            return _server
+        _server_attempted = True
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            # Otro proceso (p. ej. otra instancia de Streamlit) ya usa el puerto
+            logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
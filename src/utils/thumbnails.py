@@ -0,0 +1,32 @@
+"""Thumbnail generation for the results gallery.
+
+Runs in worker processes, so this module must stay importable without
+Streamlit or Selenium.
+"""
+from io import BytesIO
+
+from PIL import Image
+
+from ..config.constants import THUMBNAIL_MAX_WIDTH, THUMBNAIL_MAX_ASPECT, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY
+
+THUMBNAIL_MEDIA_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg", "PNG": "image/png"}
+
+
+def make_thumbnail(path, max_width=THUMBNAIL_MAX_WIDTH, max_aspect=THUMBNAIL_MAX_ASPECT,
+                   image_format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY):
+    """Build a compact preview of the image at path and return its bytes.
+
+    Full-page captures are cropped to the top max_aspect x width before
+    scaling so the preview shows the fold rather than a thin strip.
+    """
+    with Image.open(path) as image:
+        max_height = int(image.width * max_aspect)
+        if image.height > max_height:
+            image = image.crop((0, 0, image.width, max_height))
+        image = image.convert("RGB")
+        # reducing_gap reduce primero con un filtro rápido y luego afina
+        image.thumbnail((max_width, int(max_width * max_aspect)), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+        output = BytesIO()
+        image.save(output, format=image_format, quality=quality)
+        return output.getvalue()
@@ -1,7 +1,6 @@
 import validators
-import streamlit as st
+from ..config.constants import RESOLUTIONS
 
-@st.cache_data
 def validate_url(url):
     """Validate URL with user feedback"""
     if not url:
@@ -18,4 +17,14 @@ def validate_resolution(resolution_str):
         width, height = map(int, resolution_str.split('x'))
         return width > 0 and height > 0
     except:
-        return False 
\ No newline at end of file
+        return False
+
+def parse_resolution(value):
+    """Resolve a RESOLUTIONS name or a WIDTHxHEIGHT string to (name, width, height)"""
+    value = value.strip()
+    if value in RESOLUTIONS:
+        return (value, *RESOLUTIONS[value])
+    if validate_resolution(value):
+        width, height = map(int, value.split('x'))
+        return f"Custom ({width}x{height})", width, height
+    raise ValueError(f"Unknown resolution: {value!r}")